@@ -1,37 +1,343 @@
 from __future__ import annotations
 
+import json
+import os
+import threading
+import time
+from dataclasses import dataclass, field, replace
+from pathlib import Path
+
+import numpy as np
 import pandas as pd
 import psycopg
 from app.db import dsn
+from app.data_access.raster import HOUR_SECONDS, unpack_days
 
+BINS_CACHE = os.getenv("BINS_CACHE", "1") in ("1", "true", "True")
+# binary: per-oblast bytea blobs decoded straight into NumPy, rows: fetchall of tuples
+BINS_READ_MODE = os.getenv("BINS_READ_MODE", "binary")
+# entries validated this recently are served without touching Postgres
+BINS_CACHE_TTL_SECONDS = float(os.getenv("BINS_CACHE_TTL_SECONDS", "60"))
+
+# header of the memory-mapped matrix written by scripts/build_hourly_bins.py
+BINS_SNAPSHOT_PATH = os.getenv("BINS_SNAPSHOT_PATH", "/data/cache/bins_oblast.json")
+BINS_SNAPSHOT = os.getenv("BINS_SNAPSHOT", "1") in ("1", "true", "True")
+
+# cheap fingerprint of one oblast's rows: any rebuild changes at least one of these
+_STAMP_COLS = """
+count(*), max(day) - DATE '1970-01-01', sum(alarm_mask::bigint)::bigint, sum(known_mask::bigint)::bigint
+"""
+_STAMP_SQL = f"SELECT {_STAMP_COLS} FROM alarm_bins_daily WHERE oblast_uid=%s"
+
+Stamp = tuple[int, int, int, int]
+
+
+@dataclass(frozen=True)
+class _CachedBins:
+    stamp: Stamp
+    origin: int
+    flags: np.ndarray
+    checked_at: float
+
+
+_cache: dict[int, _CachedBins] = {}
+_cache_lock = threading.Lock()
+
+
+def invalidate_bins_cache(uid: int | None = None) -> None:
+    """Drops one oblast's cached bins, or every oblast's when uid is None."""
+    with _cache_lock:
+        if uid is None:
+            _cache.clear()
+        else:
+            _cache.pop(uid, None)
+
+
+_DAY_ROWS_SQL = """
+SELECT oblast_uid, (day - DATE '1970-01-01')::int, alarm_mask, known_mask
+FROM alarm_bins_daily
+{where}
+ORDER BY oblast_uid, day
+"""
+
+# one row per oblast: its (day, alarm_mask, known_mask) triples as big-endian int4 in a single bytea
+_DAY_BLOBS_SQL = """
+SELECT oblast_uid,
+       string_agg(
+         int4send((day - DATE '1970-01-01')::int) || int4send(alarm_mask) || int4send(known_mask),
+         ''::bytea ORDER BY day
+       )
+FROM alarm_bins_daily
+{where}
+GROUP BY oblast_uid
+ORDER BY oblast_uid
+"""
+
+
+def _day_rows(cur: psycopg.Cursor, uids: list[int] | None, mode: str = BINS_READ_MODE) -> np.ndarray:
+    """(oblast_uid, day, alarm_mask, known_mask) int64 rows ordered by uid and day."""
+    if uids is None:
+        where, params = "", None
+    else:
+        where, params = "WHERE oblast_uid = ANY(%s)", (list(uids),)
+
+    if mode == "rows":
+        cur.execute(_DAY_ROWS_SQL.format(where=where), params)
+        return np.array(cur.fetchall(), dtype=np.int64).reshape(-1, 4)
+
+    # binary results hand the bytea over as-is, so each oblast is one frombuffer
+    cur.execute(_DAY_BLOBS_SQL.format(where=where), params, binary=True)
+    blobs = cur.fetchall()
+    n = sum(len(blob) for _, blob in blobs) // 12
+
+    out = np.empty((n, 4), dtype=np.int64)
+    at = 0
+    for uid, blob in blobs:
+        triples = np.frombuffer(blob, dtype=">i4").reshape(-1, 3)
+        out[at:at + len(triples), 0] = uid
+        out[at:at + len(triples), 1:] = triples
+        at += len(triples)
+    return out
+
+
+def _fetch_bins(cur: psycopg.Cursor, uid: int) -> tuple[int, np.ndarray]:
+    arr = _day_rows(cur, [uid])
+    return unpack_days(arr[:, 1], arr[:, 2], arr[:, 3])
+
+
+def load_bins_hours(uid: int, use_cache: bool = BINS_CACHE) -> tuple[int, np.ndarray]:
+    """(origin hour, read-only int8 flags) of one oblast; hour = epoch seconds // 3600."""
+    hit = None
+    if use_cache:
+        with _cache_lock:
+            hit = _cache.get(uid)
+        if hit is not None and time.monotonic() - hit.checked_at < BINS_CACHE_TTL_SECONDS:
+            return hit.origin, hit.flags
 
-def load_bins_series(uid: int) -> pd.Series:
     with psycopg.connect(dsn()) as conn:
         with conn.cursor() as cur:
-            cur.execute(
-                """
-                SELECT ts, is_alarm
-                FROM alarm_bins_oblast
-                WHERE oblast_uid=%s
-                ORDER BY ts
-                """,
-                (uid,),
-            )
-            rows = cur.fetchall()
-
-    if not rows:
+            stamp = None
+            if use_cache:
+                cur.execute(_STAMP_SQL, (uid,))
+                stamp = tuple(cur.fetchone())
+                if hit is not None and hit.stamp == stamp:
+                    with _cache_lock:
+                        _cache[uid] = replace(hit, checked_at=time.monotonic())
+                    return hit.origin, hit.flags
+
+            origin, flags = _fetch_bins(cur, uid)
+
+    if len(flags) == 0:
         raise RuntimeError("No bins found for this oblast_uid")
 
-    df = pd.DataFrame(rows, columns=["ts", "is_alarm"])
-    df["ts"] = pd.to_datetime(df["ts"], utc=True)
-    df = df.set_index("ts")
+    flags.setflags(write=False)
+    if use_cache:
+        with _cache_lock:
+            _cache[uid] = _CachedBins(stamp=stamp, origin=origin, flags=flags, checked_at=time.monotonic())
+    return origin, flags
+
+
+def index_hours(index: pd.DatetimeIndex) -> np.ndarray:
+    return index.as_unit("s").asi8 // HOUR_SECONDS
 
-    idx = pd.date_range(df.index.min(), df.index.max(), freq="h", tz="UTC")
-    df = df.reindex(idx)
-    df["is_alarm"] = df["is_alarm"].fillna(0).astype(int)
-    return df["is_alarm"]
+
+def load_bins_series(uid: int) -> pd.Series:
+    origin, dense = load_bins_hours(uid)
+    n_hours = len(dense)
+
+    start = pd.Timestamp(origin * HOUR_SECONDS, unit="s", tz="UTC")
+    idx = pd.date_range(start, periods=n_hours, freq="h", unit="ns")
+    return pd.Series(np.array(dense, dtype=int), index=idx, name="is_alarm")
 
 
 def latest_ts(uid: int) -> pd.Timestamp:
-    y = load_bins_series(uid)
-    return y.index.max()
+    origin, dense = load_bins_hours(uid)
+    return pd.Timestamp((origin + len(dense) - 1) * HOUR_SECONDS, unit="s", tz="UTC").as_unit("ns")
+
+
+@dataclass(frozen=True)
+class BinsMatrix:
+    """flags[i, columns[uid]] is hour origin + i; spans[uid] is the oblast's own [row_lo, row_hi)."""
+
+    origin: int
+    flags: np.ndarray
+    columns: dict[int, int]
+    spans: dict[int, tuple[int, int]]
+    stamps: dict[int, Stamp] = field(default_factory=dict)
+
+    @property
+    def index(self) -> pd.DatetimeIndex:
+        start = pd.Timestamp(self.origin * HOUR_SECONDS, unit="s", tz="UTC")
+        return pd.date_range(start, periods=len(self.flags), freq="h", unit="ns")
+
+    def hours(self, uid: int) -> tuple[int, np.ndarray]:
+        if uid not in self.spans:
+            raise RuntimeError("No bins found for this oblast_uid")
+        lo, hi = self.spans[uid]
+        return self.origin + lo, self.flags[lo:hi, self.columns[uid]]
+
+    def series(self, uid: int) -> pd.Series:
+        origin, dense = self.hours(uid)
+        start = pd.Timestamp(origin * HOUR_SECONDS, unit="s", tz="UTC")
+        idx = pd.date_range(start, periods=len(dense), freq="h", unit="ns")
+        return pd.Series(np.array(dense, dtype=int), index=idx, name="is_alarm")
+
+    def latest_ts(self, uid: int) -> pd.Timestamp:
+        origin, dense = self.hours(uid)
+        return pd.Timestamp((origin + len(dense) - 1) * HOUR_SECONDS, unit="s", tz="UTC").as_unit("ns")
+
+    def sample(self, uids: list[int], hours: np.ndarray) -> np.ndarray:
+        """(len(hours), len(uids)) flags at arbitrary hour numbers; unknown hours read 0."""
+        out = np.zeros((len(hours), len(uids)), dtype=np.int8)
+        cols = [self.columns[u] for u in uids if u in self.columns]
+        pos = [j for j, u in enumerate(uids) if u in self.columns]
+        rows = np.asarray(hours, dtype=np.int64) - self.origin
+        keep = (rows >= 0) & (rows < len(self.flags))
+        if cols:
+            out[np.ix_(keep, pos)] = self.flags[np.ix_(rows[keep], cols)]
+        return out
+
+
+def load_bins_stamps(uids: list[int] | None = None) -> dict[int, Stamp]:
+    """Current per-oblast fingerprints, as in BinsMatrix.stamps."""
+    with psycopg.connect(dsn()) as conn:
+        with conn.cursor() as cur:
+            return _load_stamps(cur, uids)
+
+
+def _load_stamps(cur: psycopg.Cursor, uids: list[int] | None) -> dict[int, Stamp]:
+    where = "" if uids is None else "WHERE oblast_uid = ANY(%s)"
+    cur.execute(
+        f"SELECT oblast_uid, {_STAMP_COLS} FROM alarm_bins_daily {where} GROUP BY oblast_uid",
+        None if uids is None else (list(uids),),
+    )
+    return {int(r[0]): tuple(int(v) for v in r[1:]) for r in cur.fetchall()}
+
+
+def _decode_matrix(arr: np.ndarray, uids: list[int] | None) -> BinsMatrix:
+    present, first = np.unique(arr[:, 0], return_index=True)
+    last = np.append(first[1:], len(arr))
+    rows_of = {int(u): (int(a), int(b)) for u, a, b in zip(present, first, last)}
+    order = [u for u in (uids if uids is not None else rows_of) if u in rows_of]
+
+    decoded: dict[int, tuple[int, np.ndarray]] = {}
+    stamps: dict[int, Stamp] = {}
+    for uid in order:
+        a, b = rows_of[uid]
+        part = arr[a:b]
+        origin, flags = unpack_days(part[:, 1], part[:, 2], part[:, 3])
+        if len(flags):
+            decoded[uid] = (origin, flags)
+            stamps[uid] = (len(part), int(part[:, 1].max()), int(part[:, 2].sum()), int(part[:, 3].sum()))
+
+    if not decoded:
+        return BinsMatrix(origin=0, flags=np.zeros((0, 0), dtype=np.int8), columns={}, spans={})
+
+    origin = min(o for o, _ in decoded.values())
+    end = max(o + len(f) for o, f in decoded.values())
+    mat = np.zeros((end - origin, len(decoded)), dtype=np.int8)
+    columns: dict[int, int] = {}
+    spans: dict[int, tuple[int, int]] = {}
+    for j, (uid, (o, f)) in enumerate(decoded.items()):
+        lo = o - origin
+        mat[lo:lo + len(f), j] = f
+        columns[uid] = j
+        spans[uid] = (lo, lo + len(f))
+
+    mat.setflags(write=False)
+    return BinsMatrix(origin=origin, flags=mat, columns=columns, spans=spans, stamps=stamps)
+
+
+def _prime_cache(bins: BinsMatrix) -> None:
+    now = time.monotonic()
+    with _cache_lock:
+        for uid in bins.columns:
+            origin, flags = bins.hours(uid)
+            _cache[uid] = _CachedBins(stamp=bins.stamps[uid], origin=origin, flags=flags, checked_at=now)
+
+
+def write_bins_snapshot(path: str = BINS_SNAPSHOT_PATH) -> BinsMatrix:
+    """Writes a new .npy generation, then swaps in the JSON header that points at it."""
+    with psycopg.connect(dsn()) as conn:
+        with conn.cursor() as cur:
+            bins = _decode_matrix(_day_rows(cur, None), None)
+
+    header_path = Path(path)
+    header_path.parent.mkdir(parents=True, exist_ok=True)
+    data_path = header_path.with_name(f"{header_path.stem}.{time.time_ns():x}.npy")
+
+    tmp = data_path.with_suffix(".npy.tmp")
+    with open(tmp, "wb") as f:
+        np.save(f, np.ascontiguousarray(bins.flags))
+    tmp.replace(data_path)
+
+    header = {
+        "data": data_path.name,
+        "origin_hour": bins.origin,
+        "shape": list(bins.flags.shape),
+        "uids": list(bins.columns),
+        "spans": {str(u): list(v) for u, v in bins.spans.items()},
+        "stamps": {str(u): list(v) for u, v in bins.stamps.items()},
+    }
+    tmp = header_path.with_suffix(header_path.suffix + ".tmp")
+    tmp.write_text(json.dumps(header))
+    tmp.replace(header_path)
+
+    for old in header_path.parent.glob(f"{header_path.stem}.*.npy"):
+        if old != data_path:
+            old.unlink(missing_ok=True)
+
+    return bins
+
+
+def open_bins_snapshot(path: str = BINS_SNAPSHOT_PATH) -> BinsMatrix | None:
+    """Read-only memory map of the snapshot, or None when there is none."""
+    header_path = Path(path)
+    try:
+        header = json.loads(header_path.read_text())
+        flags = np.load(header_path.with_name(header["data"]), mmap_mode="r")
+    except (OSError, ValueError, KeyError):
+        return None
+
+    if list(flags.shape) != header["shape"]:
+        return None
+
+    uids = [int(u) for u in header["uids"]]
+    return BinsMatrix(
+        origin=int(header["origin_hour"]),
+        flags=flags,
+        columns={u: j for j, u in enumerate(uids)},
+        spans={int(u): (int(lo), int(hi)) for u, (lo, hi) in header["spans"].items()},
+        stamps={int(u): tuple(int(v) for v in st) for u, st in header["stamps"].items()},
+    )
+
+
+def load_bins_matrix(
+    uids: list[int] | None = None,
+    use_cache: bool = BINS_CACHE,
+    snapshot: bool = BINS_SNAPSHOT,
+) -> BinsMatrix:
+    """Bins of `uids` (default: every oblast with bins), from the snapshot while its stamps match."""
+    with psycopg.connect(dsn()) as conn:
+        with conn.cursor() as cur:
+            snap = open_bins_snapshot() if snapshot else None
+            if snap is not None:
+                current = _load_stamps(cur, uids)
+                wanted = [u for u in (uids if uids is not None else sorted(current)) if u in current]
+                if all(snap.stamps.get(u) == current[u] for u in wanted):
+                    # the mapped matrix may hold more oblasts; only the wanted ones get a column entry
+                    bins = replace(
+                        snap,
+                        columns={u: snap.columns[u] for u in wanted},
+                        spans={u: snap.spans[u] for u in wanted},
+                        stamps={u: snap.stamps[u] for u in wanted},
+                    )
+                    if use_cache:
+                        _prime_cache(bins)
+                    return bins
+
+            bins = _decode_matrix(_day_rows(cur, uids), uids)
+
+    if use_cache:
+        _prime_cache(bins)
+    return bins
@@ -0,0 +1,274 @@
+from __future__ import annotations
+
+import hashlib
+import io
+import json
+import os
+from dataclasses import dataclass
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from app.ua_oblasts import OBLASTS_ORDERED
+
+NAME_TO_UID = {o.name: o.uid for o in OBLASTS_ORDERED}
+
+EVENTS_CACHE_PATH = os.getenv("EVENTS_CACHE_PATH", "/data/cache/events_oblast.parquet")
+
+# finished_at value of events that have not finished yet
+NO_FINISH = -1
+
+HASH_CHUNK_BYTES = 1024 * 1024
+
+
+@dataclass(frozen=True)
+class EventColumns:
+    """Events in file order; times are int64 epoch seconds (UTC)."""
+
+    uid: np.ndarray
+    started_at: np.ndarray
+    finished_at: np.ndarray
+    source: np.ndarray
+    skipped: int = 0
+
+    def __len__(self) -> int:
+        return len(self.uid)
+
+    def for_uid(self, uid: int) -> EventColumns:
+        m = self.uid == uid
+        return EventColumns(self.uid[m], self.started_at[m], self.finished_at[m], self.source[m])
+
+
+def concat_columns(parts: list[EventColumns]) -> EventColumns:
+    return EventColumns(
+        uid=np.concatenate([p.uid for p in parts]),
+        started_at=np.concatenate([p.started_at for p in parts]),
+        finished_at=np.concatenate([p.finished_at for p in parts]),
+        source=np.concatenate([p.source for p in parts]),
+        skipped=sum(p.skipped for p in parts),
+    )
+
+
+def file_fingerprint(path: str, prefix_size: int | None = None) -> tuple[str, str | None]:
+    """(sha256 of the file, sha256 of its first prefix_size bytes or None), in one pass."""
+    h = hashlib.sha256()
+    prefix_hex = hashlib.sha256().hexdigest() if prefix_size == 0 else None
+    read = 0
+
+    with open(path, "rb") as f:
+        while chunk := f.read(HASH_CHUNK_BYTES):
+            if prefix_hex is None and prefix_size is not None and read + len(chunk) >= prefix_size:
+                cut = prefix_size - read
+                h.update(chunk[:cut])
+                prefix_hex = h.hexdigest()
+                h.update(chunk[cut:])
+            else:
+                h.update(chunk)
+            read += len(chunk)
+
+    return h.hexdigest(), prefix_hex
+
+
+def ends_with_newline(path: str, size: int) -> bool:
+    if size <= 0:
+        return False
+    with open(path, "rb") as f:
+        f.seek(size - 1)
+        return f.read(1) == b"\n"
+
+
+def resolve_uids(oblast: pd.Series, raion: pd.Series) -> np.ndarray:
+    """Vectorized NAME_TO_UID lookup; rows without an oblast get -1."""
+    lubny = (oblast == "Лубенський район") & raion.isin(NAME_TO_UID.keys())
+    names = oblast.where(~lubny, raion)
+
+    codes, uniques = pd.factorize(names)
+    lut = np.empty(len(uniques), dtype=np.int16)
+    for i, name in enumerate(uniques):
+        if not name:
+            lut[i] = -1
+            continue
+        uid = NAME_TO_UID.get(name)
+        if uid is None:
+            raise RuntimeError(f"Unknown oblast name: {name!r}")
+        lut[i] = uid
+
+    return lut[codes]
+
+
+def _to_epoch_seconds(s: pd.Series, column: str) -> np.ndarray:
+    dt = pd.to_datetime(s.replace("", None), utc=True, format="ISO8601").dt.as_unit("us")
+    us = dt.array.asi8
+    missing = dt.isna().to_numpy()
+
+    if np.any((us % 1_000_000 != 0) & ~missing):
+        raise RuntimeError(f"Sub-second timestamps in {column!r} are not supported by the columnar cache")
+
+    out = us // 1_000_000
+    out[missing] = NO_FINISH
+    return out
+
+
+def csv_to_columns(csv_path: str, offset: int = 0) -> EventColumns:
+    """Parses the dataset from byte `offset` (a line start) on; the header is read from the top."""
+    src: str | io.BytesIO = csv_path
+    if offset > 0:
+        with open(csv_path, "rb") as f:
+            header = f.readline()
+            f.seek(offset)
+            src = io.BytesIO(header + f.read())
+    df = pd.read_csv(src, dtype=str, keep_default_na=False, encoding="utf-8")
+
+    empty = pd.Series("", index=df.index)
+    uid = resolve_uids(df.get("oblast", empty), df.get("raion", empty))
+    keep = uid >= 0
+    df = df.loc[keep]
+
+    started_at = _to_epoch_seconds(df["started_at"], "started_at")
+    if np.any(started_at == NO_FINISH):
+        raise RuntimeError("Empty started_at in dataset")
+
+    if "finished_at" in df:
+        finished_at = _to_epoch_seconds(df["finished_at"], "finished_at")
+    else:
+        finished_at = np.full(len(df), NO_FINISH, dtype=np.int64)
+
+    source = df["source"].to_numpy(dtype=object) if "source" in df else np.full(len(df), None, dtype=object)
+
+    return EventColumns(
+        uid=uid[keep],
+        started_at=started_at,
+        finished_at=finished_at,
+        source=source,
+        skipped=int(np.count_nonzero(~keep)),
+    )
+
+
+def write_events_columnar(cols: EventColumns, out_path: str, meta: dict[str, str] | None = None) -> None:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    fin = cols.finished_at
+    table = pa.table(
+        {
+            "oblast_uid": pa.array(cols.uid, type=pa.int16()),
+            "started_at": pa.array(cols.started_at, type=pa.int64()),
+            "finished_at": pa.array(fin, type=pa.int64(), mask=fin == NO_FINISH),
+            "source": pa.array(cols.source, type=pa.string()).dictionary_encode(),
+        }
+    )
+
+    md = {"epoch_unit": "s", "skipped": str(cols.skipped)}
+    md.update(meta or {})
+    table = table.replace_schema_metadata({k.encode(): v.encode() for k, v in md.items()})
+
+    out = Path(out_path)
+    out.parent.mkdir(parents=True, exist_ok=True)
+    tmp = out.with_suffix(out.suffix + ".tmp")
+    pq.write_table(table, tmp, compression="zstd")
+    tmp.replace(out)
+
+
+def read_events_meta(path: str) -> dict[str, str]:
+    import pyarrow.parquet as pq
+
+    raw = pq.read_schema(path).metadata or {}
+    return {k.decode(): v.decode() for k, v in raw.items()}
+
+
+def load_events_columnar(path: str = EVENTS_CACHE_PATH, uid: int | None = None) -> EventColumns:
+    import pyarrow.parquet as pq
+
+    filters = [("oblast_uid", "=", uid)] if uid is not None else None
+    table = pq.read_table(path, filters=filters)
+    meta = read_events_meta(path)
+
+    return EventColumns(
+        uid=table["oblast_uid"].to_numpy(),
+        started_at=table["started_at"].to_numpy(),
+        finished_at=table["finished_at"].fill_null(NO_FINISH).to_numpy(),
+        source=table["source"].cast("string").to_numpy(zero_copy_only=False),
+        skipped=int(meta.get("skipped", "0")) if uid is None else 0,
+    )
+
+
+def cache_segments(meta: dict[str, str]) -> list[tuple[int, int, int]]:
+    """(source offset, first row, skipped rows) of each part the cache was parsed in."""
+    if "segments" in meta:
+        return [tuple(seg) for seg in json.loads(meta["segments"])]
+    return [(0, 0, int(meta.get("skipped", "0")))]
+
+
+def events_since(path: str, offset: int) -> EventColumns | None:
+    """Cached events parsed from source bytes at `offset` on, or None when no part starts there."""
+    segments = cache_segments(read_events_meta(path))
+    for i, (byte, row, _) in enumerate(segments):
+        if byte != offset:
+            continue
+        cols = load_events_columnar(path)
+        return EventColumns(
+            uid=cols.uid[row:],
+            started_at=cols.started_at[row:],
+            finished_at=cols.finished_at[row:],
+            source=cols.source[row:],
+            skipped=sum(seg[2] for seg in segments[i:]),
+        )
+    return None
+
+
+def columnar_is_fresh(cache_path: str, csv_path: str) -> bool:
+    """True when cache_path was built from csv_path as it is now (size + mtime)."""
+    if not os.path.exists(cache_path):
+        return False
+    try:
+        meta = read_events_meta(cache_path)
+    except Exception:
+        return False
+    st = os.stat(csv_path)
+    return (
+        meta.get("source_path") == os.path.abspath(csv_path)
+        and meta.get("source_size") == str(st.st_size)
+        and meta.get("source_mtime_ns") == str(st.st_mtime_ns)
+    )
+
+
+def build_events_cache(csv_path: str, cache_path: str = EVENTS_CACHE_PATH) -> EventColumns:
+    """Writes the columnar cache of csv_path, parsing only the appended bytes when it grew."""
+    st = os.stat(csv_path)
+    try:
+        meta = read_events_meta(cache_path) if os.path.exists(cache_path) else {}
+    except Exception:
+        meta = {}
+
+    prev_size = None
+    if meta.get("source_path") == os.path.abspath(csv_path) and "source_sha256" in meta:
+        prev_size = int(meta["source_size"])
+    fingerprint, prefix_fp = file_fingerprint(csv_path, prev_size)
+
+    if (
+        prev_size is not None
+        and 0 < prev_size < st.st_size
+        and prefix_fp == meta["source_sha256"]
+        and ends_with_newline(csv_path, prev_size)
+    ):
+        old = load_events_columnar(cache_path)
+        new = csv_to_columns(csv_path, offset=prev_size)
+        segments = cache_segments(meta) + [(prev_size, len(old), new.skipped)]
+        cols = concat_columns([old, new])
+    else:
+        cols = csv_to_columns(csv_path)
+        segments = [(0, 0, cols.skipped)]
+
+    write_events_columnar(
+        cols,
+        cache_path,
+        meta={
+            "source_path": os.path.abspath(csv_path),
+            "source_size": str(st.st_size),
+            "source_mtime_ns": str(st.st_mtime_ns),
+            "source_sha256": fingerprint,
+            "segments": json.dumps(segments),
+        },
+    )
+    return cols
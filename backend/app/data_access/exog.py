@@ -1,35 +1,103 @@
 from __future__ import annotations
 
+import hashlib
+import os
+from typing import Any
+
+import numpy as np
 import pandas as pd
 
-from app.data_access.bins import load_bins_series
-from app.ua_neighbors import neighbors_for
+from app.data_access.bins import BinsMatrix, index_hours, load_bins_hours
+from app.data_access.exog_store import EXOG_STORE, load_alarm_runs, load_neighbor_counts, neighbor_counts
+from app.data_access.raster import sample_hours
+from app.data_access.runs import AlarmRuns
+from app.ua_neighbors import NEIGHBORS_SOURCE, neighbors_for
+
+EXOG_RECENCY = os.getenv("EXOG_RECENCY", "0") in ("1", "true", "True")
+EXOG_RECENCY_CAP_HOURS = int(os.getenv("EXOG_RECENCY_CAP_HOURS", "168"))
+EXOG_RUN_CAP_HOURS = int(os.getenv("EXOG_RUN_CAP_HOURS", "24"))
+
+EXOG_FEATURES = "time+nbr_lag12" + ("+recency" if EXOG_RECENCY else "")
+
+
+def exog_extra(uid: int | None = None) -> dict[str, Any] | None:
+    """model_filename extra for the feature set and, with learned neighbours, the uid's neighbour set."""
+    extra: dict[str, Any] = {}
+    if EXOG_RECENCY:
+        extra["exog"] = EXOG_FEATURES
+    if uid is not None and NEIGHBORS_SOURCE != "geo":
+        nbrs = ",".join(str(n) for n in sorted(neighbors_for(uid)))
+        extra["neighbors"] = NEIGHBORS_SOURCE
+        extra["nbr_hash"] = hashlib.sha256(nbrs.encode()).hexdigest()[:16]
+    return extra or None
+
+
+def _neighbor_counts(uid: int, nbrs: list[int], hours: np.ndarray, bins: BinsMatrix | None) -> np.ndarray:
+    """Neighbours under alarm per hour, from the feature store when current, else from bins."""
+    stored = load_neighbor_counts(uid, bins) if EXOG_STORE else None
+    if stored is not None:
+        return sample_hours(stored.counts, stored.origin, hours).astype(float)
+
+    if bins is not None:
+        return neighbor_counts(bins, [uid], hours)[:, 0].astype(float)
+
+    # a neighbour without bins counts as never under alarm, as in the matrix path
+    total = np.zeros(len(hours), dtype=float)
+    for nuid in nbrs:
+        try:
+            origin, flags = load_bins_hours(nuid)
+        except RuntimeError:
+            continue
+        total += sample_hours(flags, origin, hours)
+    return total
 
 
-def build_exog_for_uid(uid: int, index: pd.DatetimeIndex) -> pd.DataFrame:
+def _alarm_runs(uid: int, bins: BinsMatrix | None) -> AlarmRuns | None:
+    """Own alarm runs, from the feature store when current, else from bins."""
+    stored = load_alarm_runs(uid, bins) if EXOG_STORE else None
+    if stored is not None:
+        return stored
+
+    try:
+        origin, flags = bins.hours(uid) if bins is not None else load_bins_hours(uid)
+    except RuntimeError:
+        return None
+    return AlarmRuns.from_flags(origin, flags)
+
+
+def _add_recency(exog: pd.DataFrame, uid: int, hours: np.ndarray, bins: BinsMatrix | None) -> None:
+    runs = _alarm_runs(uid, bins)
+    if runs is None:
+        since = np.full(len(hours), np.inf)
+        run = np.zeros(len(hours))
+    else:
+        since, run = runs.recency(hours)
+
+    exog["own_since_lag1"] = np.minimum(since, EXOG_RECENCY_CAP_HOURS) / EXOG_RECENCY_CAP_HOURS
+    exog["own_run_lag1"] = np.minimum(run, EXOG_RUN_CAP_HOURS) / EXOG_RUN_CAP_HOURS
+
+
+def build_exog_for_uid(uid: int, index: pd.DatetimeIndex, bins: BinsMatrix | None = None) -> pd.DataFrame:
     from app.ml.sarimax_core import build_time_features
 
     exog = build_time_features(index)
+    hours = index_hours(index)
 
     nbrs = neighbors_for(uid)
     if not nbrs:
         exog["nbr_frac_lag1"] = 0.0
         exog["nbr_frac_lag2"] = 0.0
         exog["nbr_any_lag1"] = 0.0
-        return exog
-
-    nbr_series = []
-    for nuid in nbrs:
-        s = load_bins_series(nuid).reindex(index).fillna(0).astype(int)
-        nbr_series.append(s)
-
-    mat = pd.concat(nbr_series, axis=1).to_numpy(dtype=float)
+    else:
+        counts = _neighbor_counts(uid, nbrs, hours, bins)
+        frac = counts / len(nbrs)
+        any1 = (counts > 0).astype(float)
 
-    frac = mat.mean(axis=1)
-    any1 = (mat.max(axis=1) > 0).astype(float)
+        exog["nbr_frac_lag1"] = pd.Series(frac, index=index).shift(1).fillna(0.0)
+        exog["nbr_frac_lag2"] = pd.Series(frac, index=index).shift(2).fillna(0.0)
+        exog["nbr_any_lag1"] = pd.Series(any1, index=index).shift(1).fillna(0.0)
 
-    exog["nbr_frac_lag1"] = pd.Series(frac, index=index).shift(1).fillna(0.0)
-    exog["nbr_frac_lag2"] = pd.Series(frac, index=index).shift(2).fillna(0.0)
-    exog["nbr_any_lag1"] = pd.Series(any1, index=index).shift(1).fillna(0.0)
+    if EXOG_RECENCY:
+        _add_recency(exog, uid, hours, bins)
 
     return exog
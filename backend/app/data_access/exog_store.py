@@ -0,0 +1,252 @@
+from __future__ import annotations
+
+import json
+import os
+from dataclasses import dataclass
+from pathlib import Path
+
+import numpy as np
+
+from app.data_access.bins import BinsMatrix, Stamp, load_bins_stamps
+from app.data_access.runs import AlarmRuns
+from app.ua_neighbors import adjacency_matrix, neighbors_for
+
+EXOG_STORE_DIR = os.getenv("EXOG_STORE_DIR", "/data/cache/exog")
+EXOG_STORE = os.getenv("EXOG_STORE", "1") in ("1", "true", "True")
+
+# hour windows [lo, hi) per oblast, hour = epoch seconds // 3600
+HourWindows = dict[int, list[tuple[int, int]]]
+
+
+@dataclass(frozen=True)
+class NeighborCounts:
+    """Per-hour number of neighbours under alarm for one oblast, from origin_hour on."""
+
+    origin: int
+    counts: np.ndarray
+    neighbors: tuple[int, ...]
+    stamps: dict[int, Stamp]
+
+
+def _paths(uid: int, store_dir: str) -> tuple[Path, Path]:
+    base = Path(store_dir)
+    return base / f"nbr_{uid}.i8", base / f"nbr_{uid}.json"
+
+
+def _read_header(uid: int, store_dir: str) -> dict | None:
+    _, header_path = _paths(uid, store_dir)
+    try:
+        return json.loads(header_path.read_text())
+    except (OSError, ValueError):
+        return None
+
+
+def _write_header(uid: int, store_dir: str, header: dict) -> None:
+    _, header_path = _paths(uid, store_dir)
+    tmp = header_path.with_suffix(".json.tmp")
+    tmp.write_text(json.dumps(header))
+    tmp.replace(header_path)
+
+
+def _runs_path(uid: int, store_dir: str) -> Path:
+    return Path(store_dir) / f"runs_{uid}.npz"
+
+
+def _read_runs(uid: int, store_dir: str) -> tuple[AlarmRuns, Stamp] | None:
+    try:
+        with np.load(_runs_path(uid, store_dir)) as z:
+            runs = AlarmRuns(
+                origin=int(z["origin"]),
+                end=int(z["end"]),
+                starts=z["starts"],
+                ends=z["ends"],
+            )
+            return runs, tuple(int(v) for v in z["stamp"])
+    except (OSError, ValueError, KeyError):
+        return None
+
+
+def _write_runs(uid: int, store_dir: str, runs: AlarmRuns, stamp: Stamp) -> None:
+    path = _runs_path(uid, store_dir)
+    tmp = path.with_suffix(".npz.tmp")
+    with open(tmp, "wb") as f:
+        np.savez(f, origin=runs.origin, end=runs.end, starts=runs.starts, ends=runs.ends, stamp=np.array(stamp))
+    tmp.replace(path)
+
+
+def neighbor_counts(bins: BinsMatrix, uids: list[int], hours: np.ndarray) -> np.ndarray:
+    """(len(hours), len(uids)) int8 neighbours under alarm, via the adjacency matrix."""
+    col_uids = [None] * bins.flags.shape[1]
+    for uid, j in bins.columns.items():
+        col_uids[j] = uid
+    adj = adjacency_matrix(uids, col_uids).astype(np.int16)
+
+    rows = np.asarray(hours, dtype=np.int64) - bins.origin
+    keep = (rows >= 0) & (rows < len(bins.flags))
+    out = np.zeros((len(rows), len(uids)), dtype=np.int8)
+    if np.any(keep):
+        out[keep] = (bins.flags[rows[keep]].astype(np.int16) @ adj.T).astype(np.int8)
+    return out
+
+
+def _neighbor_range(bins: BinsMatrix, nbrs: list[int]) -> tuple[int, int] | None:
+    spans = [bins.spans[n] for n in nbrs if n in bins.spans]
+    if not spans:
+        return None
+    return bins.origin + min(lo for lo, _ in spans), bins.origin + max(hi for _, hi in spans)
+
+
+def _stored_stamps(header: dict) -> dict[int, Stamp]:
+    return {int(u): tuple(st) for u, st in header["stamps"].items()}
+
+
+def update_exog_store(
+    bins: BinsMatrix,
+    changed: HourWindows | None = None,
+    before: dict[int, Stamp] | None = None,
+    store_dir: str = EXOG_STORE_DIR,
+) -> dict[int, str]:
+    """Patches stores built from `before` inside the `changed` windows and rewrites the rest; returns what was done."""
+    Path(store_dir).mkdir(parents=True, exist_ok=True)
+    done: dict[int, str] = {}
+
+    uids = list(bins.columns)
+    grid = bins.origin + np.arange(len(bins.flags), dtype=np.int64)
+    all_counts = neighbor_counts(bins, uids, grid)
+
+    def _count(j: int, lo: int, hi: int) -> np.ndarray:
+        return all_counts[lo - bins.origin:hi - bins.origin, j]
+
+    for j, uid in enumerate(uids):
+        nbrs = neighbors_for(uid)
+        rng = _neighbor_range(bins, nbrs) if nbrs else None
+        if rng is None:
+            continue
+        lo, hi = rng
+        present = [n for n in nbrs if n in bins.columns]
+        data_path, _ = _paths(uid, store_dir)
+
+        header = _read_header(uid, store_dir)
+        incremental = (
+            changed is not None
+            and before is not None
+            and header is not None
+            and data_path.exists()
+            and header["neighbors"] == nbrs
+            and header["origin_hour"] == lo
+            and header["n_hours"] <= hi - lo
+            and all(_stored_stamps(header).get(n) == before.get(n) for n in present)
+        )
+
+        if incremental:
+            origin, n_old = header["origin_hour"], header["n_hours"]
+            patched = 0
+            if n_old:
+                mm = np.memmap(data_path, dtype=np.int8, mode="r+", shape=(n_old,))
+                for n in present:
+                    for wlo, whi in changed.get(n, []):
+                        a, b = max(wlo, origin), min(whi, origin + n_old)
+                        if a < b:
+                            mm[a - origin:b - origin] = _count(j, a, b)
+                            patched += b - a
+                mm.flush()
+                del mm
+
+            tail = _count(j, origin + n_old, hi)
+            with open(data_path, "ab") as f:
+                f.write(tail.tobytes())
+            done[uid] = f"patched={patched} appended={len(tail)}"
+        else:
+            counts = _count(j, lo, hi)
+            tmp = data_path.with_suffix(".i8.tmp")
+            counts.tofile(tmp)
+            tmp.replace(data_path)
+            done[uid] = f"rebuilt={len(counts)}"
+
+        _write_header(
+            uid,
+            store_dir,
+            {
+                "origin_hour": lo,
+                "n_hours": hi - lo,
+                "neighbors": nbrs,
+                "stamps": {str(n): list(bins.stamps[n]) for n in present},
+            },
+        )
+
+    for uid in uids:
+        if uid not in bins.spans:
+            continue
+        origin, flags = bins.hours(uid)
+        stored = _read_runs(uid, store_dir)
+        incremental = (
+            changed is not None
+            and before is not None
+            and stored is not None
+            and stored[1] == before.get(uid)
+            and stored[0].origin == origin
+            and stored[0].end <= origin + len(flags)
+        )
+
+        if incremental:
+            runs = stored[0]
+            cut = min([lo for lo, _ in changed.get(uid, [])] + [runs.end])
+            cut = max(cut, origin)
+            runs = runs.truncate(cut).extend(flags[cut - origin:])
+            status = f"runs_extended={origin + len(flags) - cut}"
+        else:
+            runs = AlarmRuns.from_flags(origin, flags)
+            status = f"runs_rebuilt={len(runs.starts)}"
+
+        _write_runs(uid, store_dir, runs, bins.stamps[uid])
+        done[uid] = f"{done[uid]} {status}" if uid in done else status
+
+    return done
+
+
+def load_neighbor_counts(
+    uid: int,
+    bins: BinsMatrix | None = None,
+    store_dir: str = EXOG_STORE_DIR,
+) -> NeighborCounts | None:
+    """Stored counts of one oblast, or None when missing or stale."""
+    header = _read_header(uid, store_dir)
+    if header is None or header["neighbors"] != neighbors_for(uid):
+        return None
+
+    nbrs = header["neighbors"]
+    stamps = _stored_stamps(header)
+    current = bins.stamps if bins is not None else load_bins_stamps(nbrs)
+    if {n: current[n] for n in nbrs if n in current} != stamps:
+        return None
+
+    data_path, _ = _paths(uid, store_dir)
+    n_hours = int(header["n_hours"])
+    try:
+        counts = np.memmap(data_path, dtype=np.int8, mode="r", shape=(n_hours,)) if n_hours else np.zeros(0, np.int8)
+    except (OSError, ValueError):
+        return None
+
+    return NeighborCounts(
+        origin=int(header["origin_hour"]),
+        counts=counts,
+        neighbors=tuple(nbrs),
+        stamps=stamps,
+    )
+
+
+def load_alarm_runs(
+    uid: int,
+    bins: BinsMatrix | None = None,
+    store_dir: str = EXOG_STORE_DIR,
+) -> AlarmRuns | None:
+    """Stored alarm runs of one oblast, or None when missing or stale."""
+    stored = _read_runs(uid, store_dir)
+    if stored is None:
+        return None
+
+    runs, stamp = stored
+    current = bins.stamps if bins is not None else load_bins_stamps([uid])
+    if current.get(uid) != stamp:
+        return None
+    return runs
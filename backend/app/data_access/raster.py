@@ -0,0 +1,180 @@
+from __future__ import annotations
+
+import numpy as np
+
+HOUR_SECONDS = 3600
+
+
+def _as_int64(a) -> np.ndarray:
+    return np.asarray(a, dtype=np.int64)
+
+
+def hour_floor(epoch: np.ndarray) -> np.ndarray:
+    return np.floor_divide(epoch, HOUR_SECONDS)
+
+
+def hour_ceil(epoch: np.ndarray) -> np.ndarray:
+    return -np.floor_divide(-epoch, HOUR_SECONDS)
+
+
+def _close_open_ended(start: np.ndarray, end: np.ndarray, open_end: int | None) -> tuple[np.ndarray, np.ndarray]:
+    """Open-ended events (end < 0) run until open_end, or are dropped when it is None."""
+    open_mask = end < 0
+    if not np.any(open_mask):
+        return start, end
+    if open_end is None:
+        keep = ~open_mask
+        return start[keep], end[keep]
+    end = end.copy()
+    end[open_mask] = open_end
+    return start, end
+
+
+def rasterize_hours(
+    start,
+    end,
+    origin_hour: int,
+    n_hours: int,
+    open_end: int | None = None,
+) -> np.ndarray:
+    """int8 flags for hours [origin_hour, origin_hour + n_hours) covered by epoch-second intervals."""
+    start, end = _close_open_ended(_as_int64(start), _as_int64(end), open_end)
+
+    first = hour_floor(start) - origin_hour
+    last = hour_ceil(end) - origin_hour
+
+    keep = (last > first) & (last > 0) & (first < n_hours)
+    first = np.clip(first[keep], 0, n_hours)
+    last = np.clip(last[keep], 0, n_hours)
+
+    diff = np.bincount(first, minlength=n_hours + 1) - np.bincount(last, minlength=n_hours + 1)
+    return (np.cumsum(diff[:n_hours]) > 0).astype(np.int8)
+
+
+def merge_intervals(start, end) -> tuple[np.ndarray, np.ndarray]:
+    """Union of [start, end) intervals as sorted, disjoint arrays."""
+    start = _as_int64(start)
+    end = _as_int64(end)
+    keep = end > start
+    start, end = start[keep], end[keep]
+    if len(start) == 0:
+        return start, end
+
+    order = np.argsort(start, kind="stable")
+    start, end = start[order], end[order]
+
+    reach = np.maximum.accumulate(end)
+    new_group = np.empty(len(start), dtype=bool)
+    new_group[0] = True
+    new_group[1:] = start[1:] > reach[:-1]
+
+    group_first = np.flatnonzero(new_group)
+    group_last = np.append(group_first[1:] - 1, len(start) - 1)
+    return start[group_first], reach[group_last]
+
+
+def alarm_minutes(
+    start,
+    end,
+    origin_hour: int,
+    n_hours: int,
+    open_end: int | None = None,
+) -> np.ndarray:
+    """Minutes under alarm (0..60) per hour of the rasterize_hours range; overlaps count once."""
+    start, end = _close_open_ended(_as_int64(start), _as_int64(end), open_end)
+    s, e = merge_intervals(start, end)
+
+    bounds = (origin_hour + np.arange(n_hours + 1, dtype=np.int64)) * HOUR_SECONDS
+    if len(s) == 0:
+        return np.zeros(n_hours, dtype=np.float64)
+
+    # covered seconds before each boundary: whole intervals ended by then,
+    # plus the part of the interval the boundary falls into
+    cum = np.concatenate(([0], np.cumsum(e - s)))
+    k = np.searchsorted(e, bounds, side="right")
+    covered = cum[k].astype(np.float64)
+    inside = k < len(s)
+    ks = k[inside]
+    covered[inside] += np.clip(bounds[inside] - s[ks], 0, None)
+
+    return np.diff(covered) / 60.0
+
+
+def scatter_hours(hours, values, origin_hour: int, n_hours: int, fill: int = 0) -> np.ndarray:
+    """Sparse (hour, value) pairs onto a dense int8 hour range; missing hours get fill."""
+    out = np.full(n_hours, fill, dtype=np.int8)
+    idx = _as_int64(hours) - origin_hour
+    keep = (idx >= 0) & (idx < n_hours)
+    out[idx[keep]] = np.asarray(values)[keep]
+    return out
+
+
+def sample_hours(flags: np.ndarray, origin_hour: int, hours, fill: int = 0) -> np.ndarray:
+    """A dense hour array read at arbitrary hour numbers; hours outside it get fill."""
+    idx = _as_int64(hours) - origin_hour
+    keep = (idx >= 0) & (idx < len(flags))
+    out = np.full(len(idx), fill, dtype=flags.dtype)
+    out[keep] = flags[idx[keep]]
+    return out
+
+
+DAY_HOURS = 24
+_DAY_BITS = np.arange(DAY_HOURS, dtype=np.int64)
+
+
+def pack_days(flags: np.ndarray, origin_hour: int) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """(day numbers, alarm masks, known masks); bit h is UTC hour h of the day."""
+    n_hours = len(flags)
+    first_day = origin_hour // DAY_HOURS
+    n_days = -(-(origin_hour + n_hours) // DAY_HOURS) - first_day
+    offset = origin_hour - first_day * DAY_HOURS
+
+    alarm = np.zeros(n_days * DAY_HOURS, dtype=np.int64)
+    known = np.zeros(n_days * DAY_HOURS, dtype=np.int64)
+    alarm[offset:offset + n_hours] = np.asarray(flags) != 0
+    known[offset:offset + n_hours] = 1
+
+    alarm_mask = (alarm.reshape(n_days, DAY_HOURS) << _DAY_BITS).sum(axis=1)
+    known_mask = (known.reshape(n_days, DAY_HOURS) << _DAY_BITS).sum(axis=1)
+    days = first_day + np.arange(n_days, dtype=np.int64)
+    return days, alarm_mask.astype(np.int32), known_mask.astype(np.int32)
+
+
+def unpack_days(days, alarm_mask, known_mask) -> tuple[int, np.ndarray]:
+    """Inverse of pack_days; unknown hours read 0."""
+    days = _as_int64(days)
+    if len(days) == 0:
+        return 0, np.zeros(0, dtype=np.int8)
+
+    first_day = int(days.min())
+    n_days = int(days.max()) - first_day + 1
+    alarm = np.zeros(n_days, dtype=np.int64)
+    known = np.zeros(n_days, dtype=np.int64)
+    alarm[days - first_day] = _as_int64(alarm_mask)
+    known[days - first_day] = _as_int64(known_mask)
+
+    alarm_bits = ((alarm[:, None] >> _DAY_BITS) & 1).ravel()
+    known_bits = ((known[:, None] >> _DAY_BITS) & 1).ravel()
+
+    idx = np.flatnonzero(known_bits)
+    if len(idx) == 0:
+        return first_day * DAY_HOURS, np.zeros(0, dtype=np.int8)
+    lo, hi = int(idx[0]), int(idx[-1]) + 1
+    flags = (alarm_bits[lo:hi] & known_bits[lo:hi]).astype(np.int8)
+    return first_day * DAY_HOURS + lo, flags
+
+
+def rle_encode(flags) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """(run starts, run lengths, run values) of a dense array."""
+    x = np.asarray(flags)
+    n = len(x)
+    if n == 0:
+        return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64), x[:0]
+
+    starts = np.concatenate(([0], np.flatnonzero(x[1:] != x[:-1]) + 1)).astype(np.int64)
+    lengths = np.diff(np.append(starts, n))
+    return starts, lengths, x[starts]
+
+
+def rle_decode(lengths, values, dtype=np.int8) -> np.ndarray:
+    return np.repeat(np.asarray(values, dtype=dtype), _as_int64(lengths))
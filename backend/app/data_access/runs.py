@@ -0,0 +1,77 @@
+from __future__ import annotations
+
+from dataclasses import dataclass
+
+import numpy as np
+
+from app.data_access.raster import rle_decode, rle_encode
+
+
+@dataclass(frozen=True)
+class AlarmRuns:
+    """Alarm hours of one oblast as sorted, disjoint runs [starts, ends) over the known range [origin, end)."""
+
+    origin: int
+    end: int
+    starts: np.ndarray
+    ends: np.ndarray
+
+    @classmethod
+    def from_flags(cls, origin: int, flags: np.ndarray) -> AlarmRuns:
+        starts, lengths, values = rle_encode(np.asarray(flags) != 0)
+        on = values.astype(bool)
+        return cls(
+            origin=int(origin),
+            end=int(origin) + len(flags),
+            starts=int(origin) + starts[on],
+            ends=int(origin) + starts[on] + lengths[on],
+        )
+
+    def flags(self) -> np.ndarray:
+        edges = np.column_stack((self.starts, self.ends)).ravel() - self.origin
+        bounds = np.concatenate(([0], edges, [self.end - self.origin]))
+        values = np.arange(len(bounds) - 1) % 2
+        return rle_decode(np.diff(bounds), values)
+
+    def truncate(self, hour: int) -> AlarmRuns:
+        """The history known only up to `hour` (exclusive)."""
+        hour = max(self.origin, min(int(hour), self.end))
+        keep = self.starts < hour
+        return AlarmRuns(
+            origin=self.origin,
+            end=hour,
+            starts=self.starts[keep],
+            ends=np.minimum(self.ends[keep], hour),
+        )
+
+    def extend(self, flags: np.ndarray) -> AlarmRuns:
+        """Appends flags for [end, end + len(flags)), continuing a run still open at end."""
+        tail = AlarmRuns.from_flags(self.end, flags)
+        starts, ends = self.starts, self.ends
+        if len(ends) and len(tail.starts) and ends[-1] == self.end and tail.starts[0] == self.end:
+            ends = np.concatenate((ends[:-1], tail.ends[:1]))
+            tail_starts, tail_ends = tail.starts[1:], tail.ends[1:]
+        else:
+            tail_starts, tail_ends = tail.starts, tail.ends
+        return AlarmRuns(
+            origin=self.origin,
+            end=tail.end,
+            starts=np.concatenate((starts, tail_starts)),
+            ends=np.concatenate((ends, tail_ends)),
+        )
+
+    def recency(self, hours) -> tuple[np.ndarray, np.ndarray]:
+        """(hours since the last alarm, current run length) at the start of each hour; since is inf before any alarm."""
+        hours = np.asarray(hours, dtype=np.int64)
+        prev = hours - 1
+        k = np.searchsorted(self.starts, prev, side="right") - 1
+
+        since = np.full(len(hours), np.inf)
+        run = np.zeros(len(hours), dtype=np.int64)
+        seen = k >= 0
+        if np.any(seen):
+            ks, ps = k[seen], prev[seen]
+            inside = ps < self.ends[ks]
+            since[seen] = np.where(inside, 1, hours[seen] - self.ends[ks] + 1)
+            run[seen] = np.where(inside, ps - self.starts[ks] + 1, 0)
+        return since, run
@@ -30,14 +30,117 @@ def init_db() -> None:
             CREATE INDEX IF NOT EXISTS idx_alarm_events_oblast_uid_started
             ON alarm_events_oblast (oblast_uid, started_at);
             """)
+            # hourly bins packed per UTC day: bit h of alarm_mask is hour h,
+            # known_mask marks the hours that have been built
             cur.execute("""
-            CREATE TABLE IF NOT EXISTS alarm_bins_oblast (
+            CREATE TABLE IF NOT EXISTS alarm_bins_daily (
               oblast_uid INT NOT NULL,
-              ts TIMESTAMPTZ NOT NULL,
-              is_alarm SMALLINT NOT NULL,
-              PRIMARY KEY (oblast_uid, ts)
+              day DATE NOT NULL,
+              alarm_mask INT NOT NULL,
+              known_mask INT NOT NULL,
+              PRIMARY KEY (oblast_uid, day)
+            );
+            """)
+            # one-time move of the old row-per-hour table into the packed layout
+            cur.execute("""
+            DO $$
+            BEGIN
+              IF EXISTS (
+                SELECT 1 FROM pg_class
+                WHERE oid = to_regclass('alarm_bins_oblast') AND relkind = 'r'
+              ) THEN
+                INSERT INTO alarm_bins_daily (oblast_uid, day, alarm_mask, known_mask)
+                SELECT oblast_uid, DATE '1970-01-01' + (h / 24)::int,
+                       bit_or(is_alarm::int << (h % 24)::int), bit_or(1 << (h % 24)::int)
+                FROM (
+                  SELECT oblast_uid, floor(extract(epoch FROM ts) / 3600)::bigint AS h, is_alarm
+                  FROM alarm_bins_oblast
+                ) b
+                GROUP BY 1, 2
+                ON CONFLICT (oblast_uid, day) DO NOTHING;
+                DROP TABLE alarm_bins_oblast;
+              END IF;
+            END $$;
+            """)
+            # row-per-hour view for ad-hoc queries and the debug routes
+            cur.execute("""
+            CREATE OR REPLACE VIEW alarm_bins_oblast AS
+            SELECT d.oblast_uid,
+                   (d.day + make_interval(hours => h)) AT TIME ZONE 'UTC' AS ts,
+                   ((d.alarm_mask >> h) & 1)::smallint AS is_alarm
+            FROM alarm_bins_daily d
+            CROSS JOIN generate_series(0, 23) AS h
+            WHERE (d.known_mask >> h) & 1 = 1;
+            """)
+            cur.execute("""
+            CREATE TABLE IF NOT EXISTS dataset_import_ledger (
+              dataset_path TEXT NOT NULL,
+              oblast_uid INT NOT NULL,
+              fingerprint TEXT NOT NULL,
+              size_bytes BIGINT NOT NULL,
+              mtime_ns BIGINT NOT NULL,
+              last_started_at TIMESTAMPTZ,
+              imported_at TIMESTAMPTZ NOT NULL DEFAULT now(),
+              PRIMARY KEY (dataset_path, oblast_uid)
+            );
+            """)
+            cur.execute("""
+            CREATE INDEX IF NOT EXISTS idx_alarm_events_oblast_uid_finished
+            ON alarm_events_oblast (oblast_uid, finished_at);
+            """)
+            cur.execute("""
+            CREATE TABLE IF NOT EXISTS alarm_bins_dirty (
+              id BIGSERIAL PRIMARY KEY,
+              oblast_uid INT NOT NULL,
+              lo TIMESTAMPTZ NOT NULL,
+              hi TIMESTAMPTZ NOT NULL,
+              created_at TIMESTAMPTZ NOT NULL DEFAULT now()
             );
             """)
+            # every write to alarm_events_oblast marks the hours it touched,
+            # so bins can be rebuilt window by window (scripts/build_hourly_bins.py)
+            cur.execute("""
+            CREATE OR REPLACE FUNCTION alarm_events_mark_dirty() RETURNS trigger AS $$
+            BEGIN
+              IF TG_OP IN ('UPDATE', 'DELETE') THEN
+                INSERT INTO alarm_bins_dirty (oblast_uid, lo, hi)
+                SELECT oblast_uid, started_at, COALESCE(finished_at, started_at + interval '1 hour')
+                FROM old_rows;
+              END IF;
+              IF TG_OP IN ('INSERT', 'UPDATE') THEN
+                INSERT INTO alarm_bins_dirty (oblast_uid, lo, hi)
+                SELECT oblast_uid, started_at, COALESCE(finished_at, started_at + interval '1 hour')
+                FROM new_rows;
+              END IF;
+              RETURN NULL;
+            END;
+            $$ LANGUAGE plpgsql;
+            """)
+            for op, refs in (
+                ("INSERT", "NEW TABLE AS new_rows"),
+                ("UPDATE", "OLD TABLE AS old_rows NEW TABLE AS new_rows"),
+                ("DELETE", "OLD TABLE AS old_rows"),
+            ):
+                cur.execute(f"""
+                CREATE OR REPLACE TRIGGER trg_alarm_events_dirty_{op.lower()}
+                AFTER {op} ON alarm_events_oblast
+                REFERENCING {refs}
+                FOR EACH STATEMENT EXECUTE FUNCTION alarm_events_mark_dirty();
+                """)
+            cur.execute("""
+            CREATE TABLE IF NOT EXISTS oblast_leaders (
+              oblast_uid INT NOT NULL,
+              leader_uid INT NOT NULL,
+              rank INT NOT NULL,
+              lag_hours INT NOT NULL,
+              score DOUBLE PRECISION NOT NULL,
+              computed_at TIMESTAMPTZ NOT NULL DEFAULT now(),
+              PRIMARY KEY (oblast_uid, leader_uid)
+            );
+            """)
+            cur.execute("""
+            CREATE TABLE IF NOT EXISTS oblast_leaders_pending (LIKE oblast_leaders INCLUDING ALL);
+            """)
             cur.execute("""
             CREATE TABLE IF NOT EXISTS alarm_forecasts_hourly (
               oblast_uid INT NOT NULL,
@@ -52,4 +155,30 @@ def init_db() -> None:
             CREATE INDEX IF NOT EXISTS idx_alarm_forecasts_hourly_uid_ts
             ON alarm_forecasts_hourly (oblast_uid, ts);
             """)
+            cur.execute("""
+            CREATE TABLE IF NOT EXISTS model_fit_runs (
+              id BIGSERIAL PRIMARY KEY,
+              oblast_uid INT NOT NULL,
+              model_version TEXT NOT NULL,
+              script TEXT NOT NULL,
+              n_obs INT NOT NULL,
+              maxiter INT NOT NULL,
+              iterations INT,
+              coarse_iterations INT,
+              converged BOOLEAN,
+              warm_start BOOLEAN NOT NULL,
+              start_source TEXT,
+              wall_seconds DOUBLE PRECISION NOT NULL,
+              cpu_seconds DOUBLE PRECISION NOT NULL,
+              peak_rss_mb DOUBLE PRECISION,
+              artifact_bytes BIGINT,
+              error TEXT,
+              created_at TIMESTAMPTZ NOT NULL DEFAULT now()
+            );
+            """)
+            cur.execute("ALTER TABLE model_fit_runs ADD COLUMN IF NOT EXISTS coarse_iterations INT;")
+            cur.execute("""
+            CREATE INDEX IF NOT EXISTS idx_model_fit_runs_uid_created
+            ON model_fit_runs (oblast_uid, created_at);
+            """)
             conn.commit()
@@ -0,0 +1,147 @@
+from __future__ import annotations
+
+import os
+import resource
+import time
+from dataclasses import asdict, dataclass, fields
+
+import pandas as pd
+import psycopg
+from statsmodels.tsa.statespace.initialization import Initialization
+from statsmodels.tsa.statespace.sarimax import SARIMAXResults
+
+from app.db import get_conn
+from app.ml.model_store import model_artifact
+from app.ml.sarimax_core import SarimaxConfig, fit_sarimax
+
+FIT_TELEMETRY = os.getenv("FIT_TELEMETRY", "1") in ("1", "true", "True")
+
+
+@dataclass
+class FitRun:
+    oblast_uid: int
+    model_version: str
+    script: str
+    n_obs: int
+    maxiter: int
+    iterations: int | None
+    coarse_iterations: int | None
+    converged: bool | None
+    warm_start: bool
+    start_source: str | None
+    wall_seconds: float
+    cpu_seconds: float
+    peak_rss_mb: float | None
+    artifact_bytes: int | None = None
+    error: str | None = None
+
+
+_COLUMNS = [f.name for f in fields(FitRun)]
+_INSERT_SQL = (
+    f"INSERT INTO model_fit_runs ({', '.join(_COLUMNS)}) "
+    f"VALUES ({', '.join(['%s'] * len(_COLUMNS))})"
+)
+
+
+def _reset_peak_rss() -> bool:
+    """Resets VmHWM so the next reading is the peak of one fit (Linux only)."""
+    try:
+        with open("/proc/self/clear_refs", "w") as f:
+            f.write("5")
+        return True
+    except OSError:
+        return False
+
+
+def _peak_rss_mb(reset_ok: bool) -> float | None:
+    if reset_ok:
+        try:
+            with open("/proc/self/status") as f:
+                for line in f:
+                    if line.startswith("VmHWM:"):
+                        return int(line.split()[1]) / 1024.0
+        except OSError:
+            pass
+    # process lifetime peak; ru_maxrss is in KB on Linux
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024.0
+
+
+class FitRecorder:
+    """fit_sarimax with one model_fit_runs row per call, written on flush(); telemetry errors are only printed."""
+
+    def __init__(self, uid: int, model_version: str, script: str, enabled: bool = FIT_TELEMETRY) -> None:
+        self.uid = uid
+        self.model_version = model_version
+        self.script = script
+        self.enabled = enabled
+        self.runs: list[FitRun] = []
+
+    def fit(
+        self,
+        y: pd.Series,
+        exog: pd.DataFrame,
+        cfg: SarimaxConfig,
+        start_params=None,
+        maxiter_override: int | None = None,
+        start_source: str | None = None,
+        initialization: Initialization | None = None,
+    ) -> SARIMAXResults:
+        reset_ok = _reset_peak_rss()
+        wall0, cpu0 = time.perf_counter(), time.process_time()
+        res = None
+        error = None
+        try:
+            res = fit_sarimax(
+                y=y,
+                exog=exog,
+                cfg=cfg,
+                start_params=start_params,
+                maxiter_override=maxiter_override,
+                initialization=initialization,
+            )
+            return res
+        except Exception as e:
+            error = str(e)[:500]
+            raise
+        finally:
+            retvals = getattr(res, "mle_retvals", None) or {}
+            info = getattr(res, "fit_info", None)
+            # fit_sarimax drops start_params of the wrong length
+            warm = info.warm_start if info is not None else start_params is not None
+            self.runs.append(
+                FitRun(
+                    oblast_uid=self.uid,
+                    model_version=self.model_version,
+                    script=self.script,
+                    n_obs=len(y),
+                    maxiter=maxiter_override if maxiter_override is not None else cfg.maxiter,
+                    iterations=info.iterations if info is not None else None,
+                    coarse_iterations=info.coarse_iterations if info is not None else None,
+                    converged=bool(retvals["converged"]) if "converged" in retvals else None,
+                    warm_start=warm,
+                    start_source=start_source if warm else "cold",
+                    wall_seconds=time.perf_counter() - wall0,
+                    cpu_seconds=time.process_time() - cpu0,
+                    peak_rss_mb=_peak_rss_mb(reset_ok),
+                    error=error,
+                )
+            )
+
+    def flush(self, model_path: str | None = None) -> None:
+        runs, self.runs = self.runs, []
+        if not self.enabled or not runs:
+            return
+
+        if model_path is not None:
+            artifact = model_artifact(model_path)
+            if artifact is not None:
+                runs[-1].artifact_bytes = artifact.stat().st_size
+
+        rows = [tuple(asdict(r)[c] for c in _COLUMNS) for r in runs]
+        try:
+            with get_conn() as conn:
+                with conn.cursor() as cur:
+                    cur.executemany(_INSERT_SQL, rows)
+                conn.commit()
+        except psycopg.Error as e:
+            print(f"[fit-telemetry] uid={self.uid} warn: runs not recorded ({e})")
@@ -0,0 +1,110 @@
+from __future__ import annotations
+
+import os
+import pickle
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+from statsmodels.tsa.statespace.sarimax import SARIMAXResults
+
+from app.data_access.bins import BinsMatrix, load_bins_series
+from app.data_access.exog import build_exog_for_uid
+from app.ml.model_store import load_model, model_artifact
+from app.ml.sarimax_core import extend_results, results_end, results_from_state, results_state
+
+FORECAST_STATE = os.getenv("FORECAST_STATE", "1") in ("1", "true", "True")
+
+# exog lags look this many hours back; the context starts earlier so the
+# first extension hour gets the same lagged values as at training time
+_EXOG_LOOKBACK_HOURS = 2
+
+
+def state_path(model_path: str) -> Path:
+    return Path(str(model_path) + ".state")
+
+
+def _model_signature(model_path: str) -> tuple[int, int] | None:
+    p = model_artifact(model_path)
+    if p is None:
+        return None
+    st = p.stat()
+    return st.st_size, st.st_mtime_ns
+
+
+def _load_state(model_path: str, signature: tuple[int, int] | None) -> dict | None:
+    try:
+        with open(state_path(model_path), "rb") as f:
+            state = pickle.load(f)
+    except (OSError, pickle.UnpicklingError, EOFError, AttributeError):
+        return None
+    if signature is None or state.get("signature") != signature:
+        return None
+    return state
+
+
+def _save_state(model_path: str, state: dict) -> None:
+    path = state_path(model_path)
+    tmp = path.with_suffix(".state.tmp")
+    with open(tmp, "wb") as f:
+        pickle.dump(state, f, protocol=pickle.HIGHEST_PROTOCOL)
+    tmp.replace(path)
+
+
+def conditioned_forecast_inputs(
+    uid: int,
+    model_path: str,
+    horizon_hours: int,
+    bins: BinsMatrix | None = None,
+    persist: bool = FORECAST_STATE,
+) -> tuple[SARIMAXResults, pd.DataFrame]:
+    """The model filtered through every hour since training (kept next to it with `persist`), plus horizon exog."""
+    y = bins.series(uid) if bins is not None else load_bins_series(uid)
+    hour = pd.Timedelta(hours=1)
+    signature = _model_signature(model_path)
+
+    state = _load_state(model_path, signature) if persist else None
+    base = None
+    if state is None:
+        base = load_model(model_path)
+        base_end = results_end(base)
+    else:
+        base_end = state["base_end"]
+
+    last = max(y.index[-1], base_end)
+    ctx_idx = pd.date_range(base_end - _EXOG_LOOKBACK_HOURS * hour, last + horizon_hours * hour, freq="h")
+    exog = build_exog_for_uid(uid, ctx_idx, bins=bins)
+
+    seen_y = y.loc[base_end + hour:].to_numpy(dtype=np.int8)
+    seen_exog = exog.loc[base_end + hour:last].to_numpy(dtype=float)
+
+    if state is not None:
+        n_old = len(state["y"])
+        if (
+            n_old > len(seen_y)
+            or not np.array_equal(state["y"], seen_y[:n_old])
+            or not np.array_equal(state["exog"], seen_exog[:n_old])
+        ):
+            state = None
+            base = load_model(model_path)
+
+    if state is None:
+        res, n_old = base, 0
+    else:
+        res = results_from_state(state["res"])
+
+    if len(seen_y) > n_old:
+        res = extend_results(res, seen_y[n_old:], exog.loc[base_end + hour:last].iloc[n_old:])
+        if persist and signature is not None:
+            _save_state(
+                model_path,
+                {
+                    "signature": signature,
+                    "base_end": base_end,
+                    "y": seen_y,
+                    "exog": seen_exog,
+                    "res": results_state(res),
+                },
+            )
+
+    return res, exog.loc[last + hour:]
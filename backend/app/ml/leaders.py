@@ -0,0 +1,60 @@
+from __future__ import annotations
+
+from dataclasses import dataclass
+
+import numpy as np
+
+
+@dataclass(frozen=True)
+class Leader:
+    follower: int
+    leader: int
+    lag_hours: int
+    score: float
+
+
+def lagged_correlations(flags: np.ndarray, max_lag: int) -> np.ndarray:
+    """corr[lag, j, i]: correlation of column j at t - lag with column i at t; 0 for constant columns."""
+    x = np.asarray(flags, dtype=np.float64)
+    n_hours, n_cols = x.shape
+    out = np.zeros((max_lag + 1, n_cols, n_cols), dtype=np.float64)
+
+    for lag in range(max_lag + 1):
+        n = n_hours - lag
+        if n < 2:
+            break
+        a = x[:n]
+        b = x[lag:]
+        a = a - a.mean(axis=0)
+        b = b - b.mean(axis=0)
+        sa = np.sqrt((a * a).sum(axis=0))
+        sb = np.sqrt((b * b).sum(axis=0))
+        denom = np.outer(sa, sb)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            c = (a.T @ b) / denom
+        out[lag] = np.where(denom > 0, c, 0.0)
+
+    return out
+
+
+def top_leaders(
+    corr: np.ndarray,
+    uids: list[int],
+    top_n: int,
+    min_lag: int = 1,
+    min_score: float = 0.0,
+) -> list[Leader]:
+    """Per oblast, the top_n oblasts whose alarms best predict its own min_lag..max_lag hours later."""
+    lagged = corr[min_lag:]
+    best = lagged.argmax(axis=0)
+    score = np.take_along_axis(lagged, best[None], axis=0)[0]
+    np.fill_diagonal(score, -np.inf)
+
+    out: list[Leader] = []
+    for i, follower in enumerate(uids):
+        col = score[:, i]
+        for j in np.argsort(-col, kind="stable")[:top_n]:
+            if col[j] < min_score:
+                break
+            out.append(Leader(follower, uids[j], int(best[j, i]) + min_lag, float(col[j])))
+    return out
@@ -0,0 +1,224 @@
+from __future__ import annotations
+
+import fcntl
+import hashlib
+import json
+import os
+import re
+import statistics
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Iterator
+
+MODEL_REGISTRY = os.getenv("MODEL_REGISTRY", "0") in ("1", "true", "True")
+# artifacts kept per model: the current one plus previous ones for rollback
+MODEL_REGISTRY_KEEP = max(1, int(os.getenv("MODEL_REGISTRY_KEEP", "2")))
+
+MANIFEST_NAME = "manifest.json"
+PARAMS_NAME = "params.json"
+OBJECTS_DIR = "objects"
+
+_KEY_RE = re.compile(r"^sarimax_uid(\d+)_(.+)_([0-9a-f]{16})$")
+
+# json path -> ((inode, mtime_ns, size), entries)
+_json_cache: dict[str, tuple[tuple[int, int, int], dict[str, dict[str, Any]]]] = {}
+
+
+def model_key(path: str) -> str:
+    """Name of a model_filename path without the .pkl suffix."""
+    name = Path(path).name
+    return name[:-4] if name.endswith(".pkl") else name
+
+
+def _read_entries(p: Path, cached: bool = True) -> dict[str, dict[str, Any]]:
+    """Entries of a registry json file; cached per (inode, mtime, size) unless cached=False."""
+    try:
+        st = p.stat()
+    except OSError:
+        return {}
+
+    key = (st.st_ino, st.st_mtime_ns, st.st_size)
+    hit = _json_cache.get(str(p))
+    if cached and hit is not None and hit[0] == key:
+        return hit[1]
+
+    try:
+        entries = json.loads(p.read_text())["models"]
+    except (OSError, ValueError, KeyError):
+        return {}
+    _json_cache[str(p)] = (key, entries)
+    return entries
+
+
+def _write_entries(p: Path, entries: dict[str, dict[str, Any]]) -> None:
+    tmp = p.with_suffix(".json.tmp")
+    tmp.write_text(json.dumps({"models": entries}, indent=1, sort_keys=True))
+    tmp.replace(p)
+
+
+def read_manifest(model_dir: str) -> dict[str, dict[str, Any]]:
+    return _read_entries(Path(model_dir) / MANIFEST_NAME)
+
+
+@contextmanager
+def _locked(model_dir: str) -> Iterator[None]:
+    Path(model_dir).mkdir(parents=True, exist_ok=True)
+    with open(Path(model_dir) / "manifest.lock", "a") as f:
+        fcntl.flock(f, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(f, fcntl.LOCK_UN)
+
+
+def lookup(path: str) -> Path | None:
+    model_dir = str(Path(path).parent)
+    entry = read_manifest(model_dir).get(model_key(path))
+    if entry is None:
+        return None
+    artifact = Path(model_dir) / entry["artifact"]
+    return artifact if artifact.exists() else None
+
+
+def has_any_models(model_dir: str) -> bool:
+    if read_manifest(model_dir):
+        return True
+    p = Path(model_dir)
+    if not p.exists():
+        return False
+    return any(p.glob("*.pkl")) or any(p.glob("*.pkl.gz")) or any(p.glob("*.npz"))
+
+
+def _sha256(path: Path) -> str:
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def new_artifact_path(model_dir: str, suffix: str) -> Path:
+    objects = Path(model_dir) / OBJECTS_DIR
+    objects.mkdir(parents=True, exist_ok=True)
+    return objects / f"tmp-{os.getpid()}-{datetime.now(timezone.utc).timestamp():.6f}{suffix}"
+
+
+def register(
+    path: str,
+    tmp: Path,
+    suffix: str,
+    fit_seconds: float | None = None,
+    converged: bool | None = None,
+    window: dict[str, Any] | None = None,
+) -> dict[str, Any]:
+    """Stores tmp as objects/<sha256><suffix>, points `path` at it and prunes unreferenced artifacts."""
+    model_dir = str(Path(path).parent)
+    key = model_key(path)
+    sha = _sha256(tmp)
+    rel = f"{OBJECTS_DIR}/{sha[:2]}/{sha}{suffix}"
+    dst = Path(model_dir) / rel
+
+    with _locked(model_dir):
+        if dst.exists():
+            tmp.unlink()
+        else:
+            dst.parent.mkdir(parents=True, exist_ok=True)
+            tmp.replace(dst)
+
+        # fresh read: another writer in the same mtime tick can leave the cache key unchanged
+        entries = dict(_read_entries(Path(model_dir) / MANIFEST_NAME, cached=False))
+        prev = entries.get(key)
+        history = [] if prev is None else [prev["artifact"], *prev.get("history", [])]
+        history = [h for h in history if h != rel][: MODEL_REGISTRY_KEEP - 1]
+
+        m = _KEY_RE.match(key)
+        entry = {
+            "uid": int(m.group(1)) if m else None,
+            "model_version": m.group(2) if m else None,
+            "cfg_hash": m.group(3) if m else None,
+            "artifact": rel,
+            "sha256": sha,
+            "size": dst.stat().st_size,
+            "fit_seconds": fit_seconds,
+            "converged": converged,
+            "window": window,
+            "created_at": datetime.now(timezone.utc).isoformat(),
+            "history": history,
+        }
+        entries[key] = entry
+        _write_entries(Path(model_dir) / MANIFEST_NAME, entries)
+        _prune(model_dir, entries)
+
+    for legacy in (Path(path), Path(str(path) + ".gz"), Path(path).with_suffix(".npz")):
+        legacy.unlink(missing_ok=True)
+    return entry
+
+
+def _prune(model_dir: str, entries: dict[str, dict[str, Any]]) -> None:
+    keep = set()
+    for e in entries.values():
+        keep.add(e["artifact"])
+        keep.update(e.get("history", []))
+
+    objects = Path(model_dir) / OBJECTS_DIR
+    for f in objects.glob("*/*"):
+        if f.relative_to(model_dir).as_posix() not in keep:
+            f.unlink(missing_ok=True)
+
+
+def forget(path: str) -> None:
+    """Drops `path` from the manifest and params.json, with artifacts nothing else refers to."""
+    model_dir = str(Path(path).parent)
+    key = model_key(path)
+
+    with _locked(model_dir):
+        for name in (MANIFEST_NAME, PARAMS_NAME):
+            entries = dict(_read_entries(Path(model_dir) / name, cached=False))
+            if entries.pop(key, None) is not None:
+                _write_entries(Path(model_dir) / name, entries)
+                if name == MANIFEST_NAME:
+                    _prune(model_dir, entries)
+
+
+def save_params(
+    path: str,
+    names: list[str],
+    values: list[float],
+    window: dict[str, Any] | None = None,
+) -> None:
+    """Records the fitted params (and rolling window) of the model at `path` in params.json."""
+    model_dir = str(Path(path).parent)
+    key = model_key(path)
+    m = _KEY_RE.match(key)
+
+    with _locked(model_dir):
+        entries = dict(_read_entries(Path(model_dir) / PARAMS_NAME, cached=False))
+        entries[key] = {
+            "uid": int(m.group(1)) if m else None,
+            "model_version": m.group(2) if m else None,
+            "names": list(names),
+            "values": [float(v) for v in values],
+            "window": window,
+            "updated_at": datetime.now(timezone.utc).isoformat(),
+        }
+        _write_entries(Path(model_dir) / PARAMS_NAME, entries)
+
+
+def start_params(path: str, names: list[str] | None = None) -> tuple[list[float] | None, str]:
+    """(values or None, source): own last params, else the median over other oblasts of the same version."""
+    entries = _read_entries(Path(path).parent / PARAMS_NAME)
+    key = model_key(path)
+    own = entries.get(key)
+    if own is not None and (names is None or own["names"] == list(names)):
+        return own["values"], "own"
+
+    m = _KEY_RE.match(key)
+    version = m.group(2) if m else None
+    pool = [e for k, e in entries.items() if k != key and e.get("model_version") == version]
+    if names is None and pool:
+        names = statistics.mode(tuple(e["names"]) for e in pool)
+    pool = [e["values"] for e in pool if names is not None and e["names"] == list(names)]
+    if not pool:
+        return None, "cold"
+    return [statistics.median(col) for col in zip(*pool)], f"pooled({len(pool)})"
@@ -5,13 +5,19 @@ import hashlib
 import json
 import os
 import shutil
-from dataclasses import asdict
 from pathlib import Path
 from typing import Any
 
+import numpy as np
 from statsmodels.tsa.statespace.sarimax import SARIMAXResults
 
-from .sarimax_core import SarimaxConfig
+from . import model_registry
+from .sarimax_core import SarimaxConfig, results_from_state, results_state
+from .train_window import window_path
+
+MODEL_FORMAT = os.getenv("MODEL_FORMAT", "pickle")
+# pickles stored in the registry are gzipped at this (fast) level
+MODEL_REGISTRY_GZIP_LEVEL = int(os.getenv("MODEL_REGISTRY_GZIP_LEVEL", "1"))
 
 
 def ensure_dir(path: str) -> None:
@@ -29,7 +35,7 @@ def model_filename(
     cfg: SarimaxConfig,
     extra: dict[str, Any] | None = None,
 ) -> str:
-    payload: dict[str, Any] = {"uid": uid, "model_version": model_version, "cfg": asdict(cfg)}
+    payload: dict[str, Any] = {"uid": uid, "model_version": model_version, "cfg": cfg.identity()}
     if extra:
         payload["extra"] = extra
     h = _stable_hash(payload)
@@ -43,10 +49,93 @@ def _gzip_file(src: Path, dst_gz: Path, level: int = 9) -> None:
     tmp.replace(dst_gz)
 
 
-def save_model(res: SARIMAXResults, path: str) -> None:
+def compact_path(path: str) -> Path:
+    return Path(path).with_suffix(".npz")
+
+
+def model_artifact(path: str) -> Path | None:
+    """The file load_model reads: the registered artifact, else the newest npz, pkl or pkl.gz."""
+    registered = model_registry.lookup(path)
+    if registered is not None:
+        return registered
+
+    candidates = [p for p in (compact_path(path), Path(path), Path(str(path) + ".gz")) if p.exists()]
+    return max(candidates, key=lambda p: p.stat().st_mtime_ns, default=None)
+
+
+def model_exists(path: str) -> bool:
+    return model_artifact(path) is not None
+
+
+def save_compact(res: SARIMAXResults, path: str) -> None:
+    out = Path(path)
+    ensure_dir(str(out.parent))
+    tmp = out.with_suffix(out.suffix + ".tmp")
+    with open(tmp, "wb") as f:
+        np.savez(f, **results_state(res))
+    tmp.replace(out)
+
+
+def load_compact(path: str) -> SARIMAXResults:
+    with np.load(path) as z:
+        return results_from_state({k: z[k] for k in z.files})
+
+
+def _register_model(
+    res: SARIMAXResults,
+    path: str,
+    fit_seconds: float | None,
+    window: dict[str, Any] | None = None,
+) -> None:
+    model_dir = str(Path(path).parent)
+    suffix = ".npz" if MODEL_FORMAT == "npz" else ".pkl.gz"
+    tmp = model_registry.new_artifact_path(model_dir, suffix)
+
+    if MODEL_FORMAT == "npz":
+        with open(tmp, "wb") as f:
+            np.savez(f, **results_state(res))
+    else:
+        raw = tmp.with_suffix("")
+        res.save(str(raw))
+        _gzip_file(raw, tmp, level=MODEL_REGISTRY_GZIP_LEVEL)
+        raw.unlink()
+
+    retvals = getattr(res, "mle_retvals", None) or {}
+    converged = retvals.get("converged") if isinstance(retvals, dict) else None
+    model_registry.register(
+        path,
+        tmp,
+        suffix,
+        fit_seconds=fit_seconds,
+        converged=None if converged is None else bool(converged),
+        window=window,
+    )
+
+
+def save_model(
+    res: SARIMAXResults,
+    path: str,
+    fit_seconds: float | None = None,
+    window: dict[str, Any] | None = None,
+) -> None:
     out = Path(path)
     ensure_dir(str(out.parent))
 
+    model_registry.save_params(
+        path,
+        list(res.model.param_names),
+        list(np.asarray(res.params, dtype=float)),
+        window=window,
+    )
+
+    if model_registry.MODEL_REGISTRY:
+        _register_model(res, path, fit_seconds, window=window)
+        return
+
+    if MODEL_FORMAT == "npz":
+        save_compact(res, str(compact_path(path)))
+        return
+
     res.save(str(out))
 
     if os.getenv("GZIP_MODELS", "0") not in ("1", "true", "True"):
@@ -64,13 +153,37 @@ def save_model(res: SARIMAXResults, path: str) -> None:
 
 
 def load_model(path: str) -> SARIMAXResults:
-    p = Path(path)
-    if p.exists():
-        return SARIMAXResults.load(str(p))
+    p = model_artifact(path)
+    if p is None:
+        raise FileNotFoundError(f"Model not found: {path} (.pkl, .pkl.gz or .npz)")
+
+    if p.suffix == ".npz":
+        return load_compact(str(p))
+
+    if p.suffix == ".gz":
+        with gzip.open(p, "rb") as f:
+            return SARIMAXResults.load(f)
+
+    return SARIMAXResults.load(str(p))
 
-    gz = Path(str(p) + ".gz")
-    if not gz.exists():
-        raise FileNotFoundError(f"Model not found: {p} or {gz}")
 
-    with gzip.open(gz, "rb") as f:
-        return SARIMAXResults.load(f)
+def delete_model(path: str) -> None:
+    """Removes the model's registry and params entries and its pickle, npz and window files."""
+    model_registry.forget(path)
+    for f in (Path(path), Path(str(path) + ".gz"), compact_path(path), window_path(path)):
+        f.unlink(missing_ok=True)
+
+
+def warm_start_params(path: str) -> tuple[Any, str]:
+    """start_params and their source: recorded, from the saved artifact, pooled, or cold."""
+    own, source = model_registry.start_params(path)
+    if source == "own":
+        return own, source
+
+    if model_exists(path):
+        try:
+            return getattr(load_model(path), "params", None), "model"
+        except Exception as e:
+            print(f"[model-store] warn: failed to load prev model {path} ({e})")
+
+    return own, source
@@ -0,0 +1,152 @@
+from __future__ import annotations
+
+import multiprocessing as mp
+import os
+from collections.abc import Callable, Generator, Iterable, Iterator
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from concurrent.futures.process import BrokenProcessPool
+from contextlib import contextmanager
+from typing import Any
+
+# read by OpenBLAS / MKL / OpenMP when a process starts, so they only take
+# effect in freshly spawned workers
+BLAS_THREAD_VARS = (
+    "OMP_NUM_THREADS",
+    "OPENBLAS_NUM_THREADS",
+    "MKL_NUM_THREADS",
+    "VECLIB_MAXIMUM_THREADS",
+    "NUMEXPR_NUM_THREADS",
+)
+
+
+def blas_threads_per_worker(workers: int, threads: int = 0) -> int:
+    """Explicit `threads`, or the CPUs split evenly between workers (at least 1)."""
+    if threads > 0:
+        return threads
+    return max(1, (os.cpu_count() or 1) // max(1, workers))
+
+
+@contextmanager
+def pinned_blas_threads(threads: int) -> Iterator[None]:
+    """Sets the BLAS thread variables for processes started inside the block."""
+    saved = {k: os.environ.get(k) for k in BLAS_THREAD_VARS}
+    os.environ.update({k: str(threads) for k in BLAS_THREAD_VARS})
+    try:
+        yield
+    finally:
+        for k, v in saved.items():
+            if v is None:
+                os.environ.pop(k, None)
+            else:
+                os.environ[k] = v
+
+
+_started = None
+
+
+def _init_worker(started, initializer: Callable[..., None] | None, initargs: tuple) -> None:
+    global _started
+    _started = started
+    if initializer is not None:
+        initializer(*initargs)
+
+
+def _call_tracked(fn: Callable[[Any], Any], i: int, item: Any) -> Any:
+    # reported before fn runs, so the parent knows which items were in
+    # flight if this process dies
+    _started.put(i)
+    return fn(item)
+
+
+def _run_pool(
+    fn: Callable[[Any], Any],
+    items: list[Any],
+    indices: list[int],
+    workers: int,
+    threads: int,
+    initializer: Callable[..., None] | None,
+    initargs: tuple,
+) -> Generator[tuple[Any, Any, BaseException | None], None, tuple[list[int], list[int]]]:
+    """Yields results from one spawned pool; returns (unstarted, running) indices if the pool broke."""
+    ctx = mp.get_context("spawn")
+    started = ctx.SimpleQueue()
+    # workers are started by submit(), so every process of the pool is
+    # spawned inside the block and the parent's environment is restored
+    # before anything is yielded
+    with pinned_blas_threads(threads):
+        pool = ProcessPoolExecutor(
+            max_workers=min(workers, len(indices)) or 1,
+            mp_context=ctx,
+            initializer=_init_worker,
+            initargs=(started, initializer, initargs),
+        )
+        futures = {pool.submit(_call_tracked, fn, i, items[i]): i for i in indices}
+
+    finished: set[int] = set()
+    broken = False
+    with pool:
+        for fut in as_completed(futures):
+            i = futures[fut]
+            try:
+                result = fut.result()
+            except BrokenProcessPool:
+                broken = True
+                continue
+            except Exception as e:
+                finished.add(i)
+                yield items[i], None, e
+                continue
+            finished.add(i)
+            yield items[i], result, None
+
+    if not broken:
+        return [], []
+    ran: set[int] = set()
+    while not started.empty():
+        ran.add(started.get())
+    unstarted = [i for i in indices if i not in finished and i not in ran]
+    running = [i for i in indices if i not in finished and i in ran]
+    return unstarted, running
+
+
+def map_isolated(
+    fn: Callable[[Any], Any],
+    items: Iterable[Any],
+    workers: int,
+    threads: int = 0,
+    initializer: Callable[..., None] | None = None,
+    initargs: tuple = (),
+    retries: int = 1,
+) -> Iterator[tuple[Any, Any, BaseException | None]]:
+    """Yields (item, result, error) per item, in process pools when workers > 1; a dying worker fails only its item."""
+    items = list(items)
+    if workers <= 1:
+        if initializer is not None:
+            initializer(*initargs)
+        for item in items:
+            try:
+                yield item, fn(item), None
+            except Exception as e:
+                yield item, None, e
+        return
+
+    threads = blas_threads_per_worker(workers, threads)
+    pending = list(range(len(items)))
+    suspects: list[int] = []
+    while pending:
+        unstarted, running = yield from _run_pool(fn, items, pending, workers, threads, initializer, initargs)
+        if unstarted and not running:
+            # the pool died before running anything (e.g. in the initializer)
+            for i in unstarted:
+                yield items[i], None, BrokenProcessPool("worker process died before running any item")
+            break
+        pending = unstarted
+        suspects += running
+
+    for i in suspects:
+        for attempt in range(1, max(1, retries) + 1):
+            unstarted, running = yield from _run_pool(fn, items, [i], 1, threads, initializer, initargs)
+            if not unstarted and not running:
+                break
+            if attempt >= retries:
+                yield items[i], None, BrokenProcessPool(f"worker process died running this item ({attempt} isolated attempts)")
@@ -1,17 +1,58 @@
 from __future__ import annotations
 
-from dataclasses import dataclass
+import json
+import os
+from dataclasses import asdict, dataclass
+from typing import Any
+
 import numpy as np
 import pandas as pd
+from statsmodels.tsa.statespace.initialization import Initialization
+from statsmodels.tsa.statespace.kalman_filter import MEMORY_NO_SMOOTHING
 from statsmodels.tsa.statespace.sarimax import SARIMAX, SARIMAXResults
 
+SARIMAX_METHOD = os.getenv("SARIMAX_METHOD", "lbfgs")
+SARIMAX_COV_TYPE = os.getenv("SARIMAX_COV_TYPE", "approx")
+SARIMAX_SMOOTHER = os.getenv("SARIMAX_SMOOTHER", "1") in ("1", "true", "True")
+SARIMAX_LOW_MEMORY = os.getenv("SARIMAX_LOW_MEMORY", "0") in ("1", "true", "True")
+SARIMAX_COARSE_DAYS = int(os.getenv("SARIMAX_COARSE_DAYS", "0"))
+SARIMAX_COARSE_MAXITER = int(os.getenv("SARIMAX_COARSE_MAXITER", "50"))
+
+FIT_OPTIONS = ("method", "cov_type", "smoother", "low_memory", "coarse_days", "coarse_maxiter")
+
 
 @dataclass(frozen=True)
 class SarimaxConfig:
+    """Model specification plus fit-speed options, which leave the model unchanged (see identity)."""
+
     order: tuple[int, int, int] = (1, 0, 1)
     seasonal_order: tuple[int, int, int, int] = (1, 0, 1, 24)
     trend: str = "c"
     maxiter: int = 200
+    method: str = SARIMAX_METHOD
+    cov_type: str = SARIMAX_COV_TYPE
+    smoother: bool = SARIMAX_SMOOTHER
+    low_memory: bool = SARIMAX_LOW_MEMORY
+    coarse_days: int = SARIMAX_COARSE_DAYS
+    coarse_maxiter: int = SARIMAX_COARSE_MAXITER
+
+    def identity(self) -> dict[str, Any]:
+        """The fields that define the model, i.e. everything but the fit-speed options."""
+        return {k: v for k, v in asdict(self).items() if k not in FIT_OPTIONS}
+
+
+@dataclass(frozen=True)
+class FitInfo:
+    """Set on fit_sarimax results as res.fit_info."""
+
+    warm_start: bool
+    iterations: int | None
+    coarse_iterations: int | None = None
+
+
+def _iterations(res) -> int | None:
+    retvals = getattr(res, "mle_retvals", None) or {}
+    return int(retvals["iterations"]) if "iterations" in retvals else None
 
 
 def build_time_features(index: pd.DatetimeIndex) -> pd.DataFrame:
@@ -36,14 +77,8 @@ def build_time_features(index: pd.DatetimeIndex) -> pd.DataFrame:
     )
 
 
-def fit_sarimax(
-    y: pd.Series,
-    exog: pd.DataFrame,
-    cfg: SarimaxConfig,
-    start_params=None,
-    maxiter_override: int | None = None,
-) -> SARIMAXResults:
-    model = SARIMAX(
+def build_model(y, exog, cfg: SarimaxConfig, **kwargs) -> SARIMAX:
+    return SARIMAX(
         y,
         exog=exog,
         order=cfg.order,
@@ -51,11 +86,56 @@ def fit_sarimax(
         trend=cfg.trend,
         enforce_stationarity=False,
         enforce_invertibility=False,
+        **kwargs,
     )
+
+
+def fit_sarimax(
+    y: pd.Series,
+    exog: pd.DataFrame,
+    cfg: SarimaxConfig,
+    start_params=None,
+    maxiter_override: int | None = None,
+    initialization: Initialization | None = None,
+) -> SARIMAXResults:
+    """Fits cfg's model on y; `initialization` replaces the diffuse initial state."""
+    model = build_model(y, exog, cfg)
+    if initialization is not None:
+        model.ssm.initialization = initialization
+    if start_params is not None and len(start_params) != len(model.param_names):
+        start_params = None
     maxiter = maxiter_override if maxiter_override is not None else cfg.maxiter
-    res = model.fit(disp=False, maxiter=maxiter, start_params=start_params)
+    warm_start = start_params is not None
+
+    coarse_iterations = None
+    coarse_hours = cfg.coarse_days * 24
+    if start_params is None and coarse_hours > 0 and len(y) > 2 * coarse_hours:
+        coarse_exog = exog.iloc[-coarse_hours:] if exog is not None else None
+        # windows under a month make the calendar columns constant
+        coarse = build_model(y.iloc[-coarse_hours:], coarse_exog, cfg, validate_specification=False).fit(
+            disp=False,
+            method=cfg.method,
+            maxiter=cfg.coarse_maxiter,
+            cov_type="none",
+            low_memory=True,
+        )
+        start_params = coarse.params
+        coarse_iterations = _iterations(coarse)
+
+    if not cfg.smoother:
+        model.ssm.set_conserve_memory(MEMORY_NO_SMOOTHING)
+    res = model.fit(
+        disp=False,
+        method=cfg.method,
+        maxiter=maxiter,
+        start_params=start_params,
+        cov_type=cfg.cov_type,
+        low_memory=cfg.low_memory,
+    )
     if res is None:
         raise RuntimeError("SARIMAX.fit returned None (unexpected)")
+
+    res.fit_info = FitInfo(warm_start=warm_start, iterations=_iterations(res), coarse_iterations=coarse_iterations)
     return res
 
 
@@ -66,3 +146,65 @@ def forecast_probs(res: SARIMAXResults, exog_future: pd.DataFrame) -> pd.DataFra
     p = np.clip(yhat, 0.0, 1.0)
     return pd.DataFrame({"ts": idx, "p_alarm": p})
 
+
+
+def with_filter_history(res: SARIMAXResults) -> SARIMAXResults:
+    """res, or res filtered again with full output when it was fitted with low_memory."""
+    if res.predicted_state is not None:
+        return res
+    return res.model.filter(res.params, cov_type="none")
+
+
+def results_end(res: SARIMAXResults) -> pd.Timestamp:
+    return res.model._index[-1]
+
+
+def extend_results(res: SARIMAXResults, y_new, exog_new) -> SARIMAXResults:
+    """res's filter continued over the observations that follow its sample, params unchanged."""
+    if not isinstance(exog_new, pd.DataFrame):
+        exog_new = np.asarray(exog_new, dtype=float)
+    res = with_filter_history(res)
+    # a Series y breaks the second extension; a few hours of calendar columns can look constant
+    return res.extend(np.asarray(y_new, dtype=float), exog=exog_new, validate_specification=False)
+
+
+def results_state(res: SARIMAXResults) -> dict[str, np.ndarray]:
+    """Plain arrays to forecast from res: config, params, exog names, last row and filter state."""
+    res = with_filter_history(res)
+    model = res.model
+    cfg = SarimaxConfig(
+        order=tuple(model.order),
+        seasonal_order=tuple(model.seasonal_order),
+        trend=model.trend,
+    )
+    index = model._index
+    exog = np.asarray(model.exog, dtype=float) if model.exog is not None else np.zeros((model.nobs, 0))
+    return {
+        "cfg": np.array(json.dumps(asdict(cfg))),
+        "params": np.asarray(res.params, dtype=float),
+        "exog_names": np.array(model.exog_names or [], dtype=str),
+        "end": np.array(index[-1].isoformat()),
+        "freq": np.array(index.freqstr),
+        "y_last": np.asarray(model.endog, dtype=float)[-1],
+        "exog_last": exog[-1],
+        "state": np.asarray(res.predicted_state[:, -2], dtype=float),
+        "state_cov": np.asarray(res.predicted_state_cov[:, :, -2], dtype=float),
+    }
+
+
+def results_from_state(state: dict[str, np.ndarray]) -> SARIMAXResults:
+    """Inverse of results_state: forecast-ready results holding only the last observation."""
+    cfg = SarimaxConfig(**{k: tuple(v) if isinstance(v, list) else v for k, v in json.loads(str(state["cfg"])).items()})
+    index = pd.date_range(pd.Timestamp(str(state["end"])), periods=1, freq=str(state["freq"]))
+    y = pd.Series(np.asarray(state["y_last"], dtype=float).reshape(1), index=index)
+    names = [str(n) for n in state["exog_names"]]
+    exog = pd.DataFrame(np.asarray(state["exog_last"], dtype=float).reshape(1, -1), index=index, columns=names) if names else None
+
+    model = build_model(y, exog, cfg, validate_specification=False)
+    model.ssm.initialization = Initialization(
+        model.k_states,
+        "known",
+        constant=np.asarray(state["state"], dtype=float),
+        stationary_cov=np.asarray(state["state_cov"], dtype=float),
+    )
+    return model.filter(np.asarray(state["params"], dtype=float))
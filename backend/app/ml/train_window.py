@@ -0,0 +1,129 @@
+from __future__ import annotations
+
+import os
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any
+
+import numpy as np
+import pandas as pd
+from statsmodels.tsa.statespace.initialization import Initialization
+from statsmodels.tsa.statespace.sarimax import SARIMAXResults
+
+from app.ml.sarimax_core import SarimaxConfig, build_model, with_filter_history
+
+TRAIN_WINDOW_DAYS = int(os.getenv("TRAIN_WINDOW_DAYS", "0"))
+
+
+@dataclass(frozen=True)
+class TrainWindow:
+    """Sample [start, end] of a rolling-window fit and the initial state of its first hour."""
+
+    days: int
+    start: pd.Timestamp
+    end: pd.Timestamp
+    initialization: Initialization | None
+    init_source: str
+
+    def manifest_entry(self) -> dict[str, Any]:
+        return {
+            "days": self.days,
+            "start": self.start.isoformat(),
+            "end": self.end.isoformat(),
+            "init": self.init_source,
+        }
+
+
+def window_path(model_path: str) -> Path:
+    return Path(str(model_path) + ".window")
+
+
+def _load_init(model_path: str) -> dict[str, np.ndarray] | None:
+    try:
+        with np.load(window_path(model_path)) as z:
+            return {k: z[k] for k in z.files}
+    except (OSError, ValueError, KeyError):
+        return None
+
+
+def _known(state: np.ndarray, cov: np.ndarray) -> Initialization:
+    return Initialization(len(state), "known", constant=state, stationary_cov=cov)
+
+
+def _state_at(
+    y: pd.Series,
+    exog: pd.DataFrame,
+    cfg: SarimaxConfig,
+    params,
+    initialization: Initialization | None = None,
+) -> tuple[np.ndarray, np.ndarray] | None:
+    """Predicted state and covariance for the hour after y ends, filtering y with fixed params."""
+    model = build_model(y.to_numpy(dtype=float), exog, cfg, validate_specification=False)
+    if len(params) != len(model.param_names):
+        return None
+    if initialization is not None:
+        model.ssm.initialization = initialization
+    res = model.filter(np.asarray(params, dtype=float), cov_type="none")
+    return res.predicted_state[:, -1].copy(), res.predicted_state_cov[:, :, -1].copy()
+
+
+def plan_window(
+    model_path: str,
+    y: pd.Series,
+    exog: pd.DataFrame,
+    cfg: SarimaxConfig,
+    days: int,
+    params=None,
+) -> TrainWindow | None:
+    """The last `days` of y with a chained, filtered or diffuse initial state; None when y is not longer."""
+    hour = pd.Timedelta(hours=1)
+    end = y.index[-1]
+    start = end - days * 24 * hour + hour
+    if y.index[0] >= start:
+        return None
+
+    prev = _load_init(model_path)
+    if prev is not None:
+        prev_start = pd.Timestamp(str(prev["start"]))
+        if prev_start == start:
+            return TrainWindow(days, start, end, _known(prev["state"], prev["state_cov"]), "chained")
+        if y.index[0] <= prev_start < start:
+            gap = slice(prev_start, start - hour)
+            init = _known(prev["state"], prev["state_cov"])
+            out = _state_at(y.loc[gap], exog.loc[gap], cfg, prev["params"], init)
+            if out is not None:
+                return TrainWindow(days, start, end, _known(*out), "chained")
+
+    if params is not None:
+        before = slice(None, start - hour)
+        out = _state_at(y.loc[before], exog.loc[before], cfg, params)
+        if out is not None:
+            return TrainWindow(days, start, end, _known(*out), "filtered")
+
+    return TrainWindow(days, start, end, None, "diffuse")
+
+
+def save_window_init(model_path: str, res: SARIMAXResults, window: TrainWindow) -> None:
+    """Saves the window's initial state and params for the next plan_window."""
+    if window.initialization is not None:
+        start = window.start
+        state = window.initialization.constant
+        state_cov = window.initialization.stationary_cov
+    else:
+        res = with_filter_history(res)
+        start = window.start + pd.Timedelta(hours=1)
+        state = res.predicted_state[:, 1]
+        state_cov = res.predicted_state_cov[:, :, 1]
+
+    path = window_path(model_path)
+    tmp = path.with_suffix(".window.tmp")
+    with open(tmp, "wb") as f:
+        np.savez(
+            f,
+            start=np.array(start.isoformat()),
+            days=np.array(window.days),
+            params=np.asarray(res.params, dtype=float),
+            state=np.asarray(state, dtype=float),
+            state_cov=np.asarray(state_cov, dtype=float),
+        )
+    tmp.replace(path)
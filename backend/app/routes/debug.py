@@ -3,8 +3,9 @@ from __future__ import annotations
 import os
 import json
 from time import time
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, HTTPException, Query
 from ..cache import cache
+from ..db import get_conn
 from ..storage import BY_OBLAST_SNAPSHOT_FILE
 
 router = APIRouter(prefix="/debug", tags=["debug"])
@@ -42,3 +43,91 @@ def snapshot_by_oblast_info():
 def clear_cache():
     cache.clear()
     return {"ok": True}
+
+
+_TRAINING_BY_START_SQL = """
+SELECT
+    warm_start,
+    COUNT(*)::bigint,
+    AVG(wall_seconds),
+    AVG(cpu_seconds),
+    AVG(iterations),
+    percentile_cont(0.9) WITHIN GROUP (ORDER BY iterations),
+    AVG(coarse_iterations),
+    AVG(CASE WHEN converged THEN 1.0 ELSE 0.0 END),
+    AVG(CASE WHEN iterations >= maxiter THEN 1.0 ELSE 0.0 END),
+    MAX(peak_rss_mb)
+FROM model_fit_runs
+WHERE created_at >= now() - make_interval(days => %(days)s) AND error IS NULL
+GROUP BY warm_start
+"""
+
+_TRAINING_BY_OBLAST_SQL = """
+SELECT
+    oblast_uid,
+    COUNT(*)::bigint,
+    AVG(wall_seconds) FILTER (WHERE created_at >= now() - interval '7 days'),
+    AVG(wall_seconds) FILTER (WHERE created_at < now() - interval '7 days'),
+    AVG(wall_seconds) FILTER (WHERE warm_start),
+    AVG(wall_seconds) FILTER (WHERE NOT warm_start),
+    AVG(CASE WHEN converged THEN 1.0 ELSE 0.0 END),
+    COUNT(*) FILTER (WHERE error IS NOT NULL)::bigint,
+    MAX(n_obs),
+    (ARRAY_AGG(artifact_bytes ORDER BY created_at DESC) FILTER (WHERE artifact_bytes IS NOT NULL))[1],
+    MAX(created_at)
+FROM model_fit_runs
+WHERE created_at >= now() - make_interval(days => %(days)s)
+GROUP BY oblast_uid
+ORDER BY oblast_uid
+"""
+
+
+def _num(v, digits: int = 3):
+    return round(float(v), digits) if v is not None else None
+
+
+@router.get("/training")
+def training_summary(days: int = Query(30, ge=1, le=365)):
+    """Warm vs cold start fit telemetry and per-oblast fit time trends from model_fit_runs."""
+    try:
+        with get_conn() as conn:
+            with conn.cursor() as cur:
+                cur.execute(_TRAINING_BY_START_SQL, {"days": days})
+                by_start = {
+                    ("warm" if warm else "cold"): {
+                        "fits": int(n),
+                        "wall_seconds_avg": _num(wall),
+                        "cpu_seconds_avg": _num(cpu),
+                        "iterations_avg": _num(it, 1),
+                        "iterations_p90": _num(it90, 1),
+                        "coarse_iterations_avg": _num(coarse_it, 1),
+                        "converged_ratio": _num(conv),
+                        "hit_maxiter_ratio": _num(capped),
+                        "peak_rss_mb_max": _num(rss, 1),
+                    }
+                    for warm, n, wall, cpu, it, it90, coarse_it, conv, capped, rss in cur.fetchall()
+                }
+
+                cur.execute(_TRAINING_BY_OBLAST_SQL, {"days": days})
+                oblasts = []
+                for uid, n, wall_7d, wall_prev, wall_warm, wall_cold, conv, errors, n_obs, size, last in cur.fetchall():
+                    oblasts.append(
+                        {
+                            "uid": uid,
+                            "fits": int(n),
+                            "wall_seconds_7d": _num(wall_7d),
+                            "wall_seconds_before": _num(wall_prev),
+                            "wall_trend": _num(wall_7d / wall_prev) if wall_7d and wall_prev else None,
+                            "wall_seconds_warm": _num(wall_warm),
+                            "wall_seconds_cold": _num(wall_cold),
+                            "converged_ratio": _num(conv),
+                            "errors": int(errors),
+                            "n_obs_max": n_obs,
+                            "artifact_bytes": size,
+                            "last_fit_at": last.isoformat() if last else None,
+                        }
+                    )
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+    return {"days": days, "by_start": by_start, "oblasts": oblasts}
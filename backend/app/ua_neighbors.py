@@ -1,8 +1,102 @@
 from __future__ import annotations
 
+import os
+
+import numpy as np
+import psycopg
+
+from app.db import get_conn
+
+# geo: land borders below; learned: leaders from scripts/compute_leaders.py
+# (geo where none are stored); both: borders followed by learned leaders
+NEIGHBORS_SOURCE = os.getenv("NEIGHBORS_SOURCE", "geo")
+
+# land borders between oblasts (uids from app.ua_oblasts); kept symmetric
 NEIGHBORS: dict[int, list[int]] = {
+    3: [5, 10, 4, 26, 21],
+    4: [10, 14, 24, 15, 18, 3, 26],
+    5: [8, 27, 21, 3, 10],
+    8: [5, 27],
+    9: [19, 22, 28, 12, 23, 17, 15],
+    10: [5, 3, 4, 14],
+    11: [27, 13],
+    12: [9, 28, 23],
+    13: [27, 11, 26, 21],
     14: [31, 10, 25, 24, 19, 4],
+    15: [24, 19, 9, 17, 18, 4],
+    16: [28, 22],
+    17: [18, 15, 9, 23],
+    18: [4, 15, 17],
+    19: [14, 25, 20, 22, 9, 15, 24],
+    20: [25, 19, 22],
+    21: [27, 5, 3, 26, 13],
+    22: [20, 19, 9, 28, 16],
+    23: [17, 9, 12, 29],
+    24: [14, 19, 15, 4],
+    25: [14, 20, 19],
+    26: [13, 21, 3, 4],
+    27: [8, 5, 21, 13, 11],
+    28: [16, 22, 9, 12],
+    29: [23, 30],
+    30: [29],
+    31: [14],
 }
 
+# set by the worker for train_all: fit on oblast_leaders_pending, which
+# scripts/publish_leaders.py moves to oblast_leaders once the models exist
+NEIGHBORS_PENDING = os.getenv("NEIGHBORS_PENDING", "0") in ("1", "true", "True")
+
+_learned: dict[int, list[int]] | None = None
+_pending = NEIGHBORS_PENDING
+
+def _read_leaders(table: str) -> dict[int, list[int]]:
+    learned: dict[int, list[int]] = {}
+    with get_conn() as conn:
+        with conn.cursor() as cur:
+            cur.execute(f"SELECT oblast_uid, leader_uid FROM {table} ORDER BY oblast_uid, rank")
+            for uid, leader in cur.fetchall():
+                learned.setdefault(int(uid), []).append(int(leader))
+    return learned
+
+def load_learned_neighbors() -> dict[int, list[int]]:
+    """Leaders per oblast, best first, pending ones overlaid in pending mode; read once per process."""
+    global _learned
+    if _learned is None:
+        learned: dict[int, list[int]] = {}
+        try:
+            learned = _read_leaders("oblast_leaders")
+            if _pending:
+                learned.update(_read_leaders("oblast_leaders_pending"))
+        except psycopg.Error as e:
+            print(f"[neighbors] learned leaders unavailable ({e}); using borders")
+        _learned = learned
+    return _learned
+
+def reload_neighbors(pending: bool | None = None) -> None:
+    global _learned, _pending
+    _learned = None
+    if pending is not None:
+        _pending = pending
+
 def neighbors_for(uid: int) -> list[int]:
-    return NEIGHBORS.get(uid, [])
+    geo = NEIGHBORS.get(uid, [])
+    if NEIGHBORS_SOURCE == "geo":
+        return geo
+
+    learned = load_learned_neighbors().get(uid, [])
+    if NEIGHBORS_SOURCE == "learned":
+        return learned or geo
+    return geo + [n for n in learned if n not in geo]
+
+def adjacency_matrix(rows: list[int], cols: list[int] | None = None, normalized: bool = False) -> np.ndarray:
+    """A[i, j] = 1 when cols[j] neighbours rows[i]; `normalized` divides by rows[i]'s full neighbour count."""
+    cols = rows if cols is None else cols
+    pos = {uid: j for j, uid in enumerate(cols)}
+
+    a = np.zeros((len(rows), len(cols)), dtype=np.float64 if normalized else np.int8)
+    for i, uid in enumerate(rows):
+        nbrs = neighbors_for(uid)
+        for n in nbrs:
+            if n in pos:
+                a[i, pos[n]] = 1.0 / len(nbrs) if normalized else 1
+    return a
@@ -4,13 +4,13 @@ import asyncio
 import json
 import os
 import sys
-from pathlib import Path
 from time import time
 from datetime import datetime, timezone
 
 from . import alerts_client
 from .ua_oblasts import OBLASTS_ORDERED, decode_by_oblast_char
 from .storage import BY_OBLAST_SNAPSHOT_FILE
+from .ml.model_registry import has_any_models
 
 
 INTERVAL_SECONDS = int(os.getenv("BY_OBLAST_POLL_SECONDS", "120"))
@@ -25,16 +25,13 @@ _ml_lock = asyncio.Lock()
 
 
 def _has_any_models(model_dir: str) -> bool:
-    p = Path(model_dir)
-    if not p.exists():
-        return False
-    return any(p.glob("*.pkl")) or any(p.glob("*.pkl.gz"))
+    return has_any_models(model_dir)
 
 
-async def _run(cmd: list[str], name: str) -> int:
+async def _run(cmd: list[str], name: str, env: dict[str, str] | None = None) -> int:
     try:
         print(f"[worker] run {name}: {' '.join(cmd)}")
-        proc = await asyncio.create_subprocess_exec(*cmd)
+        proc = await asyncio.create_subprocess_exec(*cmd, env={**os.environ, **env} if env else None)
         rc = await proc.wait()
         if rc != 0:
             print(f"[worker] {name} failed rc={rc}")
@@ -138,8 +135,13 @@ async def train_daily_loop() -> None:
                     if rc_load != 0:
                         print("[worker] daily-train: load_data failed; skipping train for today")
                     else:
-                        rc_tr = await _run([sys.executable, "scripts/train_all_sarimax.py"], "train_all")
+                        await _run([sys.executable, "scripts/compute_leaders.py"], "compute_leaders")
+                        # train on the new leaders; forecasts switch to them per oblast in publish_leaders
+                        rc_tr = await _run(
+                            [sys.executable, "scripts/train_all_sarimax.py"], "train_all", env={"NEIGHBORS_PENDING": "1"}
+                        )
                         if rc_tr == 0:
+                            await _run([sys.executable, "scripts/publish_leaders.py"], "publish_leaders")
                             await _run([sys.executable, "scripts/forecast_all_sarimax.py"], "forecast_all")
 
                 last_day = day
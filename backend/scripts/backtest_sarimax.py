@@ -7,7 +7,7 @@ import numpy as np
 import pandas as pd
 
 from app.data_access.bins import load_bins_series
-from app.data_access.exog import build_exog_for_uid
+from app.data_access.exog import EXOG_FEATURES, build_exog_for_uid, exog_extra
 from app.ml.metrics import (
     roc_auc,
     brier,
@@ -19,8 +19,9 @@ from app.ml.metrics import (
     precision_recall_f1,
     confusion,
 )
-from app.ml.model_store import ensure_dir, model_filename, save_model, load_model
-from app.ml.sarimax_core import SarimaxConfig, fit_sarimax
+from app.ml.model_store import ensure_dir, model_exists, model_filename, save_model, load_model, warm_start_params
+from app.ml.fit_telemetry import FitRecorder
+from app.ml.sarimax_core import SarimaxConfig
 
 
 UID = int(os.getenv("BT_UID", "14"))
@@ -102,7 +103,7 @@ def main() -> None:
     cfg = SarimaxConfig()
     ensure_dir(BACKTEST_DIR)
 
-    extra = {"split": SPLIT_TS, "test_days": TEST_DAYS, "exog": "time+nbr_lag12"}
+    extra = {"split": SPLIT_TS, "test_days": TEST_DAYS, "exog": EXOG_FEATURES, **(exog_extra(UID) or {})}
     model_path = os.path.join(BACKTEST_DIR, model_filename(UID, MODEL_VERSION, cfg, extra=extra))
 
     context_idx = y.loc[train.index.min() : test.index.max()].index
@@ -110,30 +111,32 @@ def main() -> None:
     exog_train = exog_ctx.loc[train.index]
     exog_test = exog_ctx.loc[test.index]
 
-    if os.path.exists(model_path):
+    if model_exists(model_path):
         res = load_model(model_path)
         print(f"[bt] loaded cached model: {model_path}")
     else:
         start_params = None
+        source = None
 
         if USE_PROD_WARMSTART:
-            prod_path = os.path.join(PROD_MODEL_DIR, model_filename(UID, MODEL_VERSION, cfg))
-            if os.path.exists(prod_path):
-                prev = load_model(prod_path)
-                start_params = getattr(prev, "params", None)
-                print(f"[bt] warm-start params from prod model: {prod_path}")
+            prod_path = os.path.join(PROD_MODEL_DIR, model_filename(UID, MODEL_VERSION, cfg, extra=exog_extra(UID)))
+            start_params, source = warm_start_params(prod_path)
+            if start_params is not None:
+                print(f"[bt] warm-start from {source} prod params: {prod_path}")
             else:
-                print("[bt] prod model not found for warm-start; cold start")
+                print("[bt] prod params not found for warm-start; cold start")
 
+        rec = FitRecorder(UID, MODEL_VERSION, "backtest")
         t0 = time.time()
         maxiter_first = WARM_MAXITER if start_params is not None else FALLBACK_MAXITER
 
-        res = fit_sarimax(
+        res = rec.fit(
             y=train,
             exog=exog_train,
             cfg=cfg,
             start_params=start_params,
             maxiter_override=maxiter_first,
+            start_source=source,
         )
 
         converged = getattr(res, "mle_retvals", {}).get("converged", True)
@@ -142,17 +145,19 @@ def main() -> None:
         if start_params is not None and not converged and FALLBACK_MAXITER > WARM_MAXITER:
             t1 = time.time()
             print(f"[bt] warm-start did not converge, retrying maxiter={FALLBACK_MAXITER}")
-            res = fit_sarimax(
+            res = rec.fit(
                 y=train,
                 exog=exog_train,
                 cfg=cfg,
                 start_params=start_params,
                 maxiter_override=FALLBACK_MAXITER,
+                start_source=source,
             )
             converged2 = getattr(res, "mle_retvals", {}).get("converged", True)
             print(f"[bt] fallback fit done converged={converged2} seconds={time.time()-t1:.1f}")
 
         save_model(res, model_path)
+        rec.flush(model_path)
         print(f"[bt] trained+cached model: {model_path}")
 
     yhat = res.get_forecast(steps=len(test), exog=exog_test).predicted_mean.to_numpy(dtype=float)
@@ -0,0 +1,70 @@
+from __future__ import annotations
+
+import os
+import time
+import warnings
+from dataclasses import replace
+
+import numpy as np
+
+from app.data_access.bins import load_bins_series
+from app.data_access.exog import build_exog_for_uid
+from app.ml.metrics import brier, logloss, roc_auc
+from app.ml.sarimax_core import SarimaxConfig, fit_sarimax, forecast_probs
+
+BENCH_UID = int(os.getenv("BENCH_UID", "14"))
+BENCH_TEST_HOURS = int(os.getenv("BENCH_TEST_HOURS", "168"))
+BENCH_MAXITER = int(os.getenv("BENCH_MAXITER", "50"))
+BENCH_COARSE_DAYS = int(os.getenv("BENCH_COARSE_DAYS", "90"))
+# under a month, so the month_* calendar columns are constant in the coarse window
+BENCH_COARSE_SHORT_DAYS = int(os.getenv("BENCH_COARSE_SHORT_DAYS", "10"))
+BENCH_MODES = os.getenv("BENCH_MODES", "baseline,no_cov,filter_only,low_memory,coarse,coarse_short")
+
+# name -> SarimaxConfig overrides on top of the default config
+MODES: dict[str, dict] = {
+    "baseline": {"method": "lbfgs", "cov_type": "approx", "smoother": True, "low_memory": False, "coarse_days": 0},
+    "no_cov": {"cov_type": "none"},
+    "filter_only": {"cov_type": "none", "smoother": False},
+    "low_memory": {"cov_type": "none", "low_memory": True},
+    "coarse": {"cov_type": "none", "smoother": False, "coarse_days": BENCH_COARSE_DAYS},
+    "coarse_short": {"cov_type": "none", "smoother": False, "coarse_days": BENCH_COARSE_SHORT_DAYS},
+    "bfgs": {"method": "bfgs", "cov_type": "none"},
+    "nm": {"method": "nm", "cov_type": "none"},
+}
+
+
+def main() -> None:
+    warnings.simplefilter("ignore")
+
+    y = load_bins_series(BENCH_UID).astype(float)
+    exog = build_exog_for_uid(BENCH_UID, y.index)
+    y_train, y_test = y.iloc[:-BENCH_TEST_HOURS], y.iloc[-BENCH_TEST_HOURS:]
+    x_train, x_test = exog.iloc[:-BENCH_TEST_HOURS], exog.iloc[-BENCH_TEST_HOURS:]
+    y_true = y_test.to_numpy(dtype=int)
+    print(
+        f"[bench] uid={BENCH_UID} train_hours={len(y_train)} test_hours={len(y_test)} "
+        f"maxiter={BENCH_MAXITER} alarm_rate={y_true.mean():.3f}"
+    )
+
+    base = replace(SarimaxConfig(), maxiter=BENCH_MAXITER, **MODES["baseline"])
+    ref_p = None
+    for name in [m.strip() for m in BENCH_MODES.split(",") if m.strip()]:
+        cfg = replace(base, **MODES[name])
+        wall0, cpu0 = time.perf_counter(), time.process_time()
+        res = fit_sarimax(y_train, x_train, cfg)
+        wall, cpu = time.perf_counter() - wall0, time.process_time() - cpu0
+
+        p = forecast_probs(res, x_test)["p_alarm"].to_numpy(dtype=float)
+        if ref_p is None:
+            ref_p = p
+        retvals = res.mle_retvals or {}
+        print(
+            f"[bench] {name:<12} wall={wall:7.2f}s cpu={cpu:7.2f}s "
+            f"iters={retvals.get('iterations', '-')} converged={retvals.get('converged', '-')} "
+            f"llf={res.llf:.1f} brier={brier(y_true, p):.4f} auc={roc_auc(y_true, p):.4f} "
+            f"logloss={logloss(y_true, p):.4f} max_dp={np.max(np.abs(p - ref_p)):.4f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,113 @@
+from __future__ import annotations
+
+import os
+import time
+from datetime import datetime, timedelta, timezone
+
+import numpy as np
+
+from app.data_access.events import EVENTS_CACHE_PATH, NO_FINISH, load_events_columnar
+from app.data_access.raster import HOUR_SECONDS, alarm_minutes, rasterize_hours
+
+BENCH_YEARS = float(os.getenv("BENCH_YEARS", "4"))
+BENCH_OBLASTS = int(os.getenv("BENCH_OBLASTS", "27"))
+BENCH_REPEAT = int(os.getenv("BENCH_REPEAT", "3"))
+BENCH_SOURCE = os.getenv("BENCH_SOURCE", "auto")
+
+
+def synthetic_events(rng: np.random.Generator, years: float) -> tuple[np.ndarray, np.ndarray]:
+    t0 = int(datetime(2022, 2, 24, tzinfo=timezone.utc).timestamp())
+    horizon = int(years * 365 * 24 * HOUR_SECONDS)
+    n = int(horizon / (10 * HOUR_SECONDS))
+    start = np.sort(t0 + rng.integers(0, horizon, n))
+    end = start + rng.integers(5 * 60, 6 * HOUR_SECONDS, n)
+    return start, end
+
+
+def loop_hours(start: np.ndarray, end: np.ndarray) -> tuple[int, list[int]]:
+    """The pre-raster build_hourly_bins loop: a set of datetimes, then a dense walk."""
+    def floor_to_hour(dt: datetime) -> datetime:
+        return dt.replace(minute=0, second=0, microsecond=0)
+
+    def iter_hours(a: datetime, b: datetime):
+        cur = floor_to_hour(a)
+        while cur < b:
+            yield cur
+            cur += timedelta(hours=1)
+
+    events = [
+        (datetime.fromtimestamp(s, timezone.utc), datetime.fromtimestamp(e, timezone.utc))
+        for s, e in zip(start.tolist(), end.tolist())
+    ]
+    alarm_hours = set()
+    for s, e in events:
+        for h in iter_hours(s, e):
+            alarm_hours.add(h)
+
+    first = events[0][0]
+    last = max(e for _, e in events)
+    flags = [1 if h in alarm_hours else 0 for h in iter_hours(first, last)]
+    return int(floor_to_hour(first).timestamp()) // HOUR_SECONDS, flags
+
+
+def _best(fn, repeat: int) -> tuple[float, object]:
+    best = float("inf")
+    out = None
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        out = fn()
+        best = min(best, time.perf_counter() - t0)
+    return best, out
+
+
+def main() -> None:
+    per_uid: list[tuple[np.ndarray, np.ndarray]] = []
+
+    if BENCH_SOURCE != "synthetic" and os.path.exists(EVENTS_CACHE_PATH):
+        cols = load_events_columnar(EVENTS_CACHE_PATH)
+        for uid in np.unique(cols.uid):
+            ev = cols.for_uid(int(uid))
+            done = ev.finished_at != NO_FINISH
+            per_uid.append((ev.started_at[done], ev.finished_at[done]))
+        print(f"[bench] source={EVENTS_CACHE_PATH} oblasts={len(per_uid)}")
+    else:
+        rng = np.random.default_rng(0)
+        per_uid = [synthetic_events(rng, BENCH_YEARS) for _ in range(BENCH_OBLASTS)]
+        print(f"[bench] source=synthetic years={BENCH_YEARS} oblasts={len(per_uid)}")
+
+    n_events = sum(len(s) for s, _ in per_uid)
+
+    def run_loop():
+        return [loop_hours(s, e) for s, e in per_uid]
+
+    def run_raster():
+        out = []
+        for s, e in per_uid:
+            origin = int(s.min()) // HOUR_SECONDS
+            n_hours = -(-int(e.max()) // HOUR_SECONDS) - origin
+            out.append((origin, rasterize_hours(s, e, origin, n_hours)))
+        return out
+
+    def run_minutes():
+        out = []
+        for s, e in per_uid:
+            origin = int(s.min()) // HOUR_SECONDS
+            n_hours = -(-int(e.max()) // HOUR_SECONDS) - origin
+            out.append(alarm_minutes(s, e, origin, n_hours))
+        return out
+
+    t_loop, ref = _best(run_loop, 1)
+    t_raster, got = _best(run_raster, BENCH_REPEAT)
+    t_minutes, _ = _best(run_minutes, BENCH_REPEAT)
+
+    same = all(o1 == o2 and np.array_equal(np.asarray(f1, dtype=np.int8), f2) for (o1, f1), (o2, f2) in zip(ref, got))
+    n_hours = sum(len(f) for _, f in got)
+
+    print(f"[bench] events={n_events} hours={n_hours} identical={same}")
+    print(f"[bench] loop    seconds={t_loop:.3f}")
+    print(f"[bench] raster  seconds={t_raster:.4f} speedup={t_loop / t_raster:.0f}x")
+    print(f"[bench] minutes seconds={t_minutes:.4f}")
+
+
+if __name__ == "__main__":
+    main()
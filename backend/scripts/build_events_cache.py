@@ -0,0 +1,26 @@
+from __future__ import annotations
+
+import os
+import sys
+import time
+
+from app.data_access.events import EVENTS_CACHE_PATH, build_events_cache, columnar_is_fresh
+
+DATASET_PATH = os.getenv("DATASET_PATH", "/datasets/official_data_uk.csv")
+
+
+def main(csv_path: str = DATASET_PATH, cache_path: str = EVENTS_CACHE_PATH) -> None:
+    if columnar_is_fresh(cache_path, csv_path):
+        print(f"[events-cache] up to date: {cache_path}")
+        return
+
+    t0 = time.time()
+    cols = build_events_cache(csv_path, cache_path)
+    print(
+        f"[events-cache] wrote {cache_path} rows={len(cols)} skipped={cols.skipped} "
+        f"size={os.path.getsize(cache_path)} seconds={time.time() - t0:.2f}"
+    )
+
+
+if __name__ == "__main__":
+    main(*sys.argv[1:2])
@@ -1,77 +1,435 @@
 from __future__ import annotations
 
+import io
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta, timezone
+import numpy as np
 import psycopg
 
 from app.db import dsn
+from app.data_access.bins import (
+    BINS_SNAPSHOT,
+    BINS_SNAPSHOT_PATH,
+    load_bins_matrix,
+    load_bins_stamps,
+    write_bins_snapshot,
+)
+from app.data_access.exog_store import EXOG_STORE, update_exog_store
+from app.data_access.raster import HOUR_SECONDS, pack_days, rasterize_hours
 from app.ua_oblasts import OBLASTS_ORDERED
 
-BIN_SECONDS = 3600
+BIN_SECONDS = HOUR_SECONDS
+
+BINS_INCREMENTAL = os.getenv("BINS_INCREMENTAL", "1") in ("1", "true", "True")
+BINS_MODE = os.getenv("BINS_MODE", "sql")
+BINS_EXTEND_TO_NOW = os.getenv("BINS_EXTEND_TO_NOW", "1") in ("1", "true", "True")
+# dirty windows closer than this are rebuilt as one
+DIRTY_MERGE_GAP_HOURS = int(os.getenv("BINS_DIRTY_MERGE_GAP_HOURS", "24"))
+# oblasts built concurrently, one Postgres connection each (ignored by sql_all)
+BINS_WORKERS = max(1, int(os.getenv("BINS_WORKERS", "1")))
+
+# [lo, hi) with lo on an hour boundary
+Window = tuple[datetime, datetime]
 
 def floor_to_hour(dt: datetime) -> datetime:
     return dt.replace(minute=0, second=0, microsecond=0)
 
+def ceil_to_hour(dt: datetime) -> datetime:
+    h = floor_to_hour(dt)
+    return h if h == dt else h + timedelta(hours=1)
+
 def iter_hours(start: datetime, end: datetime):
     cur = floor_to_hour(start)
     while cur < end:
         yield cur
         cur += timedelta(hours=1)
 
-def main() -> None:
+def merge_windows(windows: list[Window], gap: timedelta = timedelta(0)) -> list[Window]:
+    out: list[Window] = []
+    for lo, hi in sorted(windows):
+        if lo >= hi:
+            continue
+        if out and lo <= out[-1][1] + gap:
+            out[-1] = (out[-1][0], max(out[-1][1], hi))
+        else:
+            out.append((lo, hi))
+    return out
+
+# Dirty rows merged per oblast into windows (rows closer than the gap join
+# one window), with the ids of the rows each window covers.
+DIRTY_WINDOWS_SQL = """
+WITH d AS (
+  SELECT id, oblast_uid, lo, hi,
+         max(hi) OVER (PARTITION BY oblast_uid ORDER BY lo, id
+                       ROWS BETWEEN UNBOUNDED PRECEDING AND 1 PRECEDING) AS prev_hi
+  FROM alarm_bins_dirty
+), g AS (
+  SELECT id, oblast_uid, lo, hi,
+         sum(CASE WHEN prev_hi IS NULL OR lo > prev_hi + %s THEN 1 ELSE 0 END)
+           OVER (PARTITION BY oblast_uid ORDER BY lo, id) AS island
+  FROM d
+)
+SELECT oblast_uid, min(lo), max(hi), array_agg(id)
+FROM g
+GROUP BY oblast_uid, island
+"""
+
+def load_dirty(cur: psycopg.Cursor) -> tuple[dict[int, list[Window]], dict[int, list[int]]]:
+    """Dirty windows per oblast and the row ids read, so only those are cleared after the build."""
+    cur.execute(DIRTY_WINDOWS_SQL, (timedelta(hours=DIRTY_MERGE_GAP_HOURS),))
+    dirty: dict[int, list[Window]] = {}
+    ids: dict[int, list[int]] = {}
+    for uid, lo, hi, row_ids in cur.fetchall():
+        dirty.setdefault(int(uid), []).append((floor_to_hour(lo), ceil_to_hour(hi)))
+        ids.setdefault(int(uid), []).extend(row_ids)
+    return dirty, ids
+
+def load_bounds(cur: psycopg.Cursor) -> dict[int, tuple[datetime, datetime]]:
+    cur.execute(
+        """
+        SELECT oblast_uid, min(started_at), max(finished_at)
+        FROM alarm_events_oblast
+        GROUP BY oblast_uid
+        HAVING max(finished_at) IS NOT NULL
+        """
+    )
+    return {int(uid): (lo, hi) for uid, lo, hi in cur.fetchall()}
+
+def last_bin_ts(cur: psycopg.Cursor, uid: int) -> datetime | None:
+    cur.execute(
+        "SELECT day, known_mask FROM alarm_bins_daily WHERE oblast_uid=%s ORDER BY day DESC LIMIT 1",
+        (uid,),
+    )
+    row = cur.fetchone()
+    if row is None:
+        return None
+    day, known = row
+    start = datetime(day.year, day.month, day.day, tzinfo=timezone.utc)
+    return start + timedelta(hours=int(known).bit_length() - 1)
+
+# Upserts per-day masks from `src` (oblast_uid, day, alarm_mask, known_mask).
+# Rows for the same day are OR-ed first; the hours they mark as known replace
+# the stored bits, other hours of the day are kept.
+MERGE_DAYS_SQL = """
+INSERT INTO alarm_bins_daily (oblast_uid, day, alarm_mask, known_mask)
+SELECT oblast_uid, day, bit_or(alarm_mask), bit_or(known_mask)
+FROM ({src}) AS p
+GROUP BY oblast_uid, day
+ON CONFLICT (oblast_uid, day) DO UPDATE SET
+  alarm_mask = (alarm_bins_daily.alarm_mask & ~EXCLUDED.known_mask) | EXCLUDED.alarm_mask,
+  known_mask = alarm_bins_daily.known_mask | EXCLUDED.known_mask
+"""
+
+# (oblast_uid, hour, is_alarm) rows, hour = epoch seconds // 3600, as day masks
+HOURS_AS_DAYS_SQL = """
+SELECT oblast_uid, DATE '1970-01-01' + (hour / 24)::int AS day,
+       is_alarm::int << mod(hour, 24)::int AS alarm_mask, 1 << mod(hour, 24)::int AS known_mask
+FROM {src}
+"""
+
+def plan_builds(
+    cur: psycopg.Cursor,
+    uids: list[int],
+    incremental: bool,
+    extend_to_now: bool = BINS_EXTEND_TO_NOW,
+) -> tuple[dict[int, list[Window] | None], dict[int, list[int]]]:
+    """Windows to rebuild per oblast: dirty ones plus the tail, or the full range; None without events."""
+    dirty, dirty_ids = load_dirty(cur)
+    bounds = load_bounds(cur)
+    now_hour = floor_to_hour(datetime.now(timezone.utc))
+    gap = timedelta(hours=DIRTY_MERGE_GAP_HOURS)
+
+    plan: dict[int, list[Window] | None] = {}
+
+    for uid in uids:
+        if uid not in bounds:
+            plan[uid] = None
+            continue
+
+        min_start, max_finish = bounds[uid]
+        start = floor_to_hour(min_start)
+        end = max(max_finish, now_hour) if extend_to_now else max_finish
+
+        last_ts = last_bin_ts(cur, uid) if incremental else None
+        if last_ts is None:
+            plan[uid] = [(start, end)]
+            continue
+
+        windows = [(max(lo, start), min(hi, end)) for lo, hi in dirty.get(uid, [])]
+        windows.append((last_ts + timedelta(hours=1), end))
+        plan[uid] = merge_windows(windows, gap)
+
+    return plan, dirty_ids
+
+def build_uid(cur: psycopg.Cursor, uid: int, windows: list[Window]) -> int:
+    """Recomputes bins of one oblast inside the given windows; returns hours written."""
+    cur.execute(
+        """
+        CREATE TEMP TABLE IF NOT EXISTS alarm_bins_hour_stage (
+          oblast_uid INT NOT NULL,
+          hour BIGINT NOT NULL,
+          is_alarm SMALLINT NOT NULL
+        ) ON COMMIT DELETE ROWS
+        """
+    )
+    total = 0
+
+    for lo, hi in windows:
+        cur.execute(
+            """
+            SELECT started_at, finished_at
+            FROM alarm_events_oblast
+            WHERE oblast_uid=%s AND finished_at > %s AND started_at < %s
+            ORDER BY started_at
+            """,
+            (uid, lo, hi),
+        )
+        events = cur.fetchall()
+
+        alarm_hours = set()
+        for started_at, finished_at in events:
+            if finished_at is None:
+                continue
+            for h in iter_hours(started_at, finished_at):
+                alarm_hours.add(h)
+
+        for h in iter_hours(lo, hi):
+            is_alarm = 1 if h in alarm_hours else 0
+            cur.execute(
+                "INSERT INTO alarm_bins_hour_stage (oblast_uid, hour, is_alarm) VALUES (%s, %s, %s)",
+                (uid, int(h.timestamp()) // HOUR_SECONDS, is_alarm),
+            )
+            total += 1
+
+    cur.execute(MERGE_DAYS_SQL.format(src=HOURS_AS_DAYS_SQL.format(src="alarm_bins_hour_stage")))
+    return total
+
+def build_uid_numpy(cur: psycopg.Cursor, uid: int, windows: list[Window]) -> int:
+    """build_uid via app.data_access.raster and one COPY + upsert."""
+    cur.execute(
+        """
+        CREATE TEMP TABLE IF NOT EXISTS alarm_bins_day_stage (
+          day INT NOT NULL,
+          alarm_mask INT NOT NULL,
+          known_mask INT NOT NULL
+        ) ON COMMIT DELETE ROWS
+        """
+    )
+
+    buf = io.BytesIO()
+    total = 0
+
+    for lo, hi in windows:
+        cur.execute(
+            """
+            SELECT floor(extract(epoch FROM started_at))::bigint, ceil(extract(epoch FROM finished_at))::bigint
+            FROM alarm_events_oblast
+            WHERE oblast_uid=%s AND finished_at > %s AND started_at < %s
+            """,
+            (uid, lo, hi),
+        )
+        ev = np.array(cur.fetchall(), dtype=np.int64).reshape(-1, 2)
+
+        origin = int(lo.timestamp()) // HOUR_SECONDS
+        n_hours = -(-int(np.ceil(hi.timestamp())) // HOUR_SECONDS) - origin
+        flags = rasterize_hours(ev[:, 0], ev[:, 1], origin, n_hours)
+
+        days, alarm_mask, known_mask = pack_days(flags, origin)
+        np.savetxt(buf, np.column_stack((days, alarm_mask, known_mask)), fmt="%d", delimiter="\t")
+        total += n_hours
+
+    with cur.copy("COPY alarm_bins_day_stage (day, alarm_mask, known_mask) FROM STDIN") as copy:
+        copy.write(buf.getvalue())
+
+    src = """
+    SELECT %(uid)s AS oblast_uid, DATE '1970-01-01' + day AS day, alarm_mask, known_mask
+    FROM alarm_bins_day_stage
+    """
+    cur.execute(MERGE_DAYS_SQL.format(src=src), {"uid": uid})
+    return total
+
+BUILD_BINS_SQL = """
+WITH ranges AS (
+  SELECT *
+  FROM unnest(%(uids)s::int[], %(los)s::timestamptz[], %(his)s::timestamptz[]) AS r(oblast_uid, lo, hi)
+),
+alarm AS (
+  SELECT DISTINCT g.oblast_uid, h.ts
+  FROM ranges g
+  JOIN alarm_events_oblast e
+    ON e.oblast_uid = g.oblast_uid AND e.finished_at > g.lo AND e.started_at < g.hi
+  CROSS JOIN LATERAL generate_series(
+    date_trunc('hour', e.started_at), e.finished_at - interval '1 microsecond', interval '1 hour'
+  ) AS h(ts)
+),
+dense AS (
+  SELECT g.oblast_uid, h.ts
+  FROM ranges g
+  CROSS JOIN LATERAL generate_series(g.lo, g.hi - interval '1 microsecond', interval '1 hour') AS h(ts)
+),
+hourly AS (
+  SELECT d.oblast_uid, floor(extract(epoch FROM d.ts) / 3600)::bigint AS hour,
+         CASE WHEN a.ts IS NULL THEN 0 ELSE 1 END AS is_alarm
+  FROM dense d
+  LEFT JOIN alarm a ON a.oblast_uid = d.oblast_uid AND a.ts = d.ts
+),
+ins AS (
+""" + MERGE_DAYS_SQL.format(src=HOURS_AS_DAYS_SQL.format(src="hourly")) + """
+)
+SELECT oblast_uid, count(*) FROM hourly GROUP BY oblast_uid
+"""
+
+def build_sql(cur: psycopg.Cursor, plan: dict[int, list[Window]]) -> dict[int, int]:
+    """build_uid for many oblasts in one statement (windows of an oblast must not overlap); returns hours per uid."""
+    uids: list[int] = []
+    los: list[datetime] = []
+    his: list[datetime] = []
+    for uid, windows in plan.items():
+        for lo, hi in windows:
+            uids.append(uid)
+            los.append(lo)
+            his.append(hi)
+
+    if not uids:
+        return {}
+
+    cur.execute(BUILD_BINS_SQL, {"uids": uids, "los": los, "his": his})
+    return {int(uid): int(n) for uid, n in cur.fetchall()}
+
+def _report(uid: int, total: int | None, windows: list[Window] | None, secs: float | None = None) -> None:
+    if windows is None:
+        print(f"[bins] uid={uid}: no data")
+        return
+    if not windows:
+        print(f"[bins] uid={uid}: up to date")
+        return
+    took = f" secs={secs:.2f}" if secs is not None else ""
+    print(f"[bins] uid={uid}: hours={total or 0} windows={len(windows)} from={windows[0][0].isoformat()}{took}")
+
+def _clear_dirty(cur: psycopg.Cursor, ids: list[int]) -> None:
+    if not ids:
+        return
+    cur.execute("DELETE FROM alarm_bins_dirty WHERE id = ANY(%s)", (ids,))
+
+def build_one(
+    conn: psycopg.Connection,
+    uid: int,
+    windows: list[Window] | None,
+    mode: str,
+    dirty_ids: list[int],
+) -> tuple[int | None, float]:
+    """Builds one oblast in its own transaction; returns (hours written, seconds)."""
+    t0 = time.perf_counter()
+    total = None
+
+    with conn.cursor() as cur:
+        if windows:
+            if mode == "sql":
+                total = build_sql(cur, {uid: windows}).get(uid)
+            elif mode == "numpy":
+                total = build_uid_numpy(cur, uid, windows)
+            else:
+                total = build_uid(cur, uid, windows)
+
+        _clear_dirty(cur, dirty_ids)
+    conn.commit()
+
+    return total, time.perf_counter() - t0
+
+def build_parallel(
+    plan: dict[int, list[Window] | None],
+    mode: str,
+    dirty_ids: dict[int, list[int]],
+    workers: int,
+) -> None:
+    """Builds oblasts on up to `workers` threads, each with its own connection."""
+    local = threading.local()
+    conns: list[psycopg.Connection] = []
+    lock = threading.Lock()
+
+    def run(uid: int, windows: list[Window] | None) -> tuple[int | None, float]:
+        conn = getattr(local, "conn", None)
+        if conn is None:
+            conn = psycopg.connect(dsn())
+            local.conn = conn
+            with lock:
+                conns.append(conn)
+        return build_one(conn, uid, windows, mode, dirty_ids.get(uid, []))
+
+    # largest rebuilds first so a long oblast does not start last
+    order = sorted(
+        plan.items(),
+        key=lambda kv: -sum((hi - lo).total_seconds() for lo, hi in kv[1] or []),
+    )
+
+    try:
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="bins") as pool:
+            futures = {uid: pool.submit(run, uid, windows) for uid, windows in order}
+            for uid, windows in order:
+                total, secs = futures[uid].result()
+                _report(uid, total, windows, secs)
+    finally:
+        for conn in conns:
+            conn.close()
+
+def main(
+    incremental: bool = BINS_INCREMENTAL,
+    mode: str = BINS_MODE,
+    workers: int = BINS_WORKERS,
+    snapshot: bool = BINS_SNAPSHOT,
+    exog_store: bool = EXOG_STORE,
+) -> None:
+    if mode not in ("python", "numpy", "sql", "sql_all"):
+        raise RuntimeError(f"Unknown BINS_MODE: {mode!r} (expected 'python', 'numpy', 'sql' or 'sql_all')")
+
     uids = [o.uid for o in OBLASTS_ORDERED]
 
     with psycopg.connect(dsn()) as conn:
         with conn.cursor() as cur:
-            for uid in uids:
-                cur.execute(
-                    "SELECT min(started_at), max(finished_at) FROM alarm_events_oblast WHERE oblast_uid=%s",
-                    (uid,),
-                )
-                row = cur.fetchone()
-                if not row or row[0] is None or row[1] is None:
-                    print(f"[bins] uid={uid}: no data")
-                    continue
-
-                min_start, max_finish = row[0], row[1]
-                if max_finish is None:
-                    max_finish = datetime.now(timezone.utc)
-
-                cur.execute(
-                    """
-                    SELECT started_at, finished_at
-                    FROM alarm_events_oblast
-                    WHERE oblast_uid=%s
-                    ORDER BY started_at
-                    """,
-                    (uid,),
-                )
-                events = cur.fetchall()
-
-                alarm_hours = set()
-                for started_at, finished_at in events:
-                    if finished_at is None:
-                        continue
-                    for h in iter_hours(started_at, finished_at):
-                        alarm_hours.add(h)
-
-                total = 0
-                inserted = 0
-
-                for h in iter_hours(min_start, max_finish):
-                    is_alarm = 1 if h in alarm_hours else 0
-                    cur.execute(
-                        """
-                        INSERT INTO alarm_bins_oblast (oblast_uid, ts, is_alarm)
-                        VALUES (%s, %s, %s)
-                        ON CONFLICT (oblast_uid, ts) DO UPDATE SET is_alarm=EXCLUDED.is_alarm
-                        """,
-                        (uid, h, is_alarm),
-                    )
-                    total += 1
-                    inserted += cur.rowcount
+            plan, dirty_ids = plan_builds(cur, uids, incremental)
+            conn.commit()
+            before = load_bins_stamps() if exog_store else None
 
+            if mode == "sql_all":
+                totals = build_sql(cur, {u: w for u, w in plan.items() if w})
+                _clear_dirty(cur, [i for uid in uids for i in dirty_ids.get(uid, [])])
                 conn.commit()
-                print(f"[bins] uid={uid}: hours={total}")
+                for uid, windows in plan.items():
+                    _report(uid, totals.get(uid), windows)
+            elif workers == 1:
+                for uid, windows in plan.items():
+                    total, secs = build_one(conn, uid, windows, mode, dirty_ids.get(uid, []))
+                    _report(uid, total, windows, secs)
+
+    if mode != "sql_all" and workers > 1:
+        t0 = time.perf_counter()
+        build_parallel(plan, mode, dirty_ids, workers)
+        print(f"[bins] workers={workers} mode={mode} total_secs={time.perf_counter() - t0:.2f}")
+
+    bins = None
+    if snapshot:
+        try:
+            bins = write_bins_snapshot()
+            print(f"[bins] snapshot: {BINS_SNAPSHOT_PATH} hours={bins.flags.shape[0]} oblasts={bins.flags.shape[1]}")
+        except OSError as e:
+            print(f"[bins] snapshot not written: {e}")
+
+    if exog_store:
+        if bins is None:
+            bins = load_bins_matrix(use_cache=False, snapshot=False)
+        changed = {
+            uid: [(int(lo.timestamp()) // HOUR_SECONDS, -(-int(hi.timestamp()) // HOUR_SECONDS)) for lo, hi in windows]
+            for uid, windows in plan.items()
+            if windows
+        }
+        try:
+            for uid, what in update_exog_store(bins, changed, before).items():
+                print(f"[bins] exog store uid={uid}: {what}")
+        except OSError as e:
+            print(f"[bins] exog store not updated: {e}")
 
 if __name__ == "__main__":
     main()
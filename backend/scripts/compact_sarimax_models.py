@@ -5,8 +5,30 @@ import gzip
 import shutil
 from pathlib import Path
 
+from app.ml.model_store import compact_path, load_model, save_compact
+
 MODEL_DIR = Path(os.getenv("MODEL_DIR", "/data/models/sarimax"))
 REMOVE_ORIGINAL = os.getenv("REMOVE_ORIGINAL", "0") == "1"
+# gz: gzip the pickles; npz: convert them to the compact params + state format
+COMPACT_TO = os.getenv("COMPACT_TO", "gz")
+
+
+def to_npz(pkl_path: Path) -> None:
+    npz_path = compact_path(str(pkl_path))
+    if npz_path.exists():
+        print(f"[compact] skip (already npz): {npz_path.name}")
+        return
+
+    print(f"[compact] converting {pkl_path.name} -> {npz_path.name}")
+    save_compact(load_model(str(pkl_path)), str(npz_path))
+
+    orig_size = pkl_path.stat().st_size
+    npz_size = npz_path.stat().st_size
+    print(f"[compact] done: orig={orig_size/1024/1024:.1f}MB npz={npz_size/1024:.1f}KB")
+
+    if REMOVE_ORIGINAL:
+        pkl_path.unlink()
+        print(f"[compact] removed original: {pkl_path.name}")
 
 
 def main() -> None:
@@ -22,6 +44,10 @@ def main() -> None:
     print(f"[compact] found {len(pkl_files)} model(s)")
 
     for pkl_path in pkl_files:
+        if COMPACT_TO == "npz":
+            to_npz(pkl_path)
+            continue
+
         gz_path = pkl_path.with_suffix(pkl_path.suffix + ".gz")
 
         if gz_path.exists():
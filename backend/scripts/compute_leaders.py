@@ -0,0 +1,65 @@
+from __future__ import annotations
+
+import os
+import time
+
+import psycopg
+
+from app.db import dsn
+from app.data_access.bins import load_bins_matrix
+from app.ml.leaders import lagged_correlations, top_leaders
+
+LEADERS_MAX_LAG = int(os.getenv("LEADERS_MAX_LAG", "3"))
+LEADERS_TOP_N = int(os.getenv("LEADERS_TOP_N", "5"))
+LEADERS_MIN_SCORE = float(os.getenv("LEADERS_MIN_SCORE", "0.1"))
+LEADERS_LOOKBACK_DAYS = int(os.getenv("LEADERS_LOOKBACK_DAYS", "365"))
+
+
+def main() -> int:
+    t0 = time.perf_counter()
+    bins = load_bins_matrix()
+    if not bins.columns:
+        print("[leaders] no bins, skip")
+        return 0
+
+    uids = list(bins.columns)
+    cols = [bins.columns[u] for u in uids]
+    flags = bins.flags[-LEADERS_LOOKBACK_DAYS * 24:, cols]
+
+    corr = lagged_correlations(flags, LEADERS_MAX_LAG)
+    leaders = top_leaders(corr, uids, LEADERS_TOP_N, min_lag=1, min_score=LEADERS_MIN_SCORE)
+    t_corr = time.perf_counter() - t0
+
+    rows = []
+    rank = 0
+    prev = None
+    for ld in leaders:
+        rank = rank + 1 if ld.follower == prev else 1
+        prev = ld.follower
+        rows.append((ld.follower, ld.leader, rank, ld.lag_hours, ld.score))
+
+    with psycopg.connect(dsn()) as conn:
+        with conn.cursor() as cur:
+            cur.execute("DELETE FROM oblast_leaders_pending")
+            cur.executemany(
+                """
+                INSERT INTO oblast_leaders_pending (oblast_uid, leader_uid, rank, lag_hours, score)
+                VALUES (%s, %s, %s, %s, %s)
+                """,
+                rows,
+            )
+        conn.commit()
+
+    for uid in uids:
+        top = ", ".join(f"{r[1]}@{r[3]}h={r[4]:.2f}" for r in rows if r[0] == uid)
+        print(f"[leaders] uid={uid}: {top or '-'}")
+    print(
+        f"[leaders] oblasts={len(uids)} hours={len(flags)} lags=0..{LEADERS_MAX_LAG} "
+        f"rows={len(rows)} corr_secs={t_corr:.2f}"
+    )
+
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
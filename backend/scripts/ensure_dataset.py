@@ -1,29 +1,141 @@
 from __future__ import annotations
 
+import hashlib
+import json
 import os
 import httpx
 
 DATASET_URL = os.getenv("DATASET_URL")
 DATASET_PATH = os.getenv("DATASET_PATH", "/datasets/official_data_uk.csv")
+DATASET_SHA256 = os.getenv("DATASET_SHA256", "").strip().lower() or None
+DATASET_REVALIDATE = os.getenv("DATASET_REVALIDATE", "1") in ("1", "true", "True")
+
+CHUNK_BYTES = 1024 * 1024
+
+def _meta_path(path: str) -> str:
+    return path + ".meta.json"
+
+def _part_path(path: str) -> str:
+    return path + ".part"
+
+def _read_json(path: str) -> dict:
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (FileNotFoundError, ValueError):
+        return {}
+
+def _write_json(path: str, payload: dict) -> None:
+    tmp = path + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(payload, f)
+    os.replace(tmp, path)
+
+def _hash_file_into(h, path: str) -> None:
+    with open(path, "rb") as f:
+        while chunk := f.read(CHUNK_BYTES):
+            h.update(chunk)
+
+def _exists(path: str) -> bool:
+    return os.path.exists(path) and os.path.getsize(path) > 0
+
+def download(client: httpx.Client, url: str, path: str, expected_sha256: str | None = None) -> bool:
+    """Downloads url to path, resuming a leftover .part; False when the server answers 304."""
+    meta_path = _meta_path(path)
+    part = _part_path(path)
+    part_meta_path = part + ".json"
+
+    meta = _read_json(meta_path) if _exists(path) else {}
+    part_meta = _read_json(part_meta_path)
+
+    headers: dict[str, str] = {}
+    if meta.get("etag"):
+        headers["If-None-Match"] = meta["etag"]
+
+    offset = os.path.getsize(part) if os.path.exists(part) else 0
+    validator = part_meta.get("etag") or part_meta.get("last_modified")
+    if offset > 0 and validator and part_meta.get("url") == url:
+        headers["Range"] = f"bytes={offset}-"
+        headers["If-Range"] = validator
+
+    with client.stream("GET", url, headers=headers) as r:
+        if r.status_code == 304:
+            return False
+        if r.status_code == 416:
+            # stale .part (e.g. longer than the new file): start over
+            os.remove(part)
+            os.remove(part_meta_path)
+            return download(client, url, path, expected_sha256)
+        r.raise_for_status()
+
+        etag = r.headers.get("ETag")
+        last_modified = r.headers.get("Last-Modified")
+        h = hashlib.sha256()
+        if r.status_code == 206:
+            _hash_file_into(h, part)
+            mode = "ab"
+            print(f"[dataset] resuming at byte {offset}")
+        else:
+            mode = "wb"
+
+        _write_json(part_meta_path, {"url": url, "etag": etag, "last_modified": last_modified})
+
+        with open(part, mode) as f:
+            for chunk in r.iter_bytes():
+                f.write(chunk)
+                h.update(chunk)
+            f.flush()
+            os.fsync(f.fileno())
+
+    digest = h.hexdigest()
+    if expected_sha256 and digest != expected_sha256:
+        os.remove(part)
+        os.remove(part_meta_path)
+        raise RuntimeError(f"Dataset checksum mismatch: expected {expected_sha256}, got {digest}")
+
+    os.replace(part, path)
+    os.remove(part_meta_path)
+    _write_json(
+        meta_path,
+        {
+            "url": url,
+            "etag": etag,
+            "last_modified": last_modified,
+            "size": os.path.getsize(path),
+            "sha256": digest,
+        },
+    )
+    return True
 
 def main() -> None:
-    if os.path.exists(DATASET_PATH) and os.path.getsize(DATASET_PATH) > 0:
+    have_file = _exists(DATASET_PATH)
+
+    if have_file and not DATASET_REVALIDATE:
         print(f"[dataset] ok: {DATASET_PATH}")
         return
 
     if not DATASET_URL:
+        if have_file:
+            print(f"[dataset] ok: {DATASET_PATH} (DATASET_URL not set, not revalidated)")
+            return
         raise RuntimeError("DATASET_URL is not set and dataset file is missing")
 
     os.makedirs(os.path.dirname(DATASET_PATH), exist_ok=True)
-    print(f"[dataset] downloading: {DATASET_URL} -> {DATASET_PATH}")
+    print(f"[dataset] syncing: {DATASET_URL} -> {DATASET_PATH}")
 
-    with httpx.Client(timeout=60.0, follow_redirects=True) as client:
-        r = client.get(DATASET_URL)
-        r.raise_for_status()
-        with open(DATASET_PATH, "wb") as f:
-            f.write(r.content)
+    try:
+        with httpx.Client(timeout=60.0, follow_redirects=True) as client:
+            changed = download(client, DATASET_URL, DATASET_PATH, DATASET_SHA256)
+    except (httpx.HTTPError, OSError) as e:
+        if not have_file:
+            raise
+        print(f"[dataset] revalidation failed ({e}); keeping existing {DATASET_PATH}")
+        return
 
-    print("[dataset] downloaded")
+    if changed:
+        print(f"[dataset] downloaded: size={os.path.getsize(DATASET_PATH)}")
+    else:
+        print(f"[dataset] not modified: {DATASET_PATH}")
 
 if __name__ == "__main__":
     main()
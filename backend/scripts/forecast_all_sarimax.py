@@ -3,22 +3,29 @@ from __future__ import annotations
 import os
 
 import psycopg
-import pandas as pd
 
 from app.db import dsn
 from app.ua_oblasts import OBLASTS_ORDERED
-from app.data_access.bins import latest_ts
+from app.data_access.bins import BinsMatrix, load_bins_matrix
 
 from app.ml.sarimax_core import SarimaxConfig, forecast_probs
-from app.ml.model_store import load_model, model_filename
+from app.ml.forecast_state import conditioned_forecast_inputs
+from app.ml.model_store import model_exists, model_filename
+from app.ml.parallel import blas_threads_per_worker, map_isolated
 
-from app.data_access.exog import build_exog_for_uid
+from app.data_access.exog import exog_extra
 
 
 HORIZON_HOURS = int(os.getenv("HORIZON_HOURS", "168"))
 MODEL_VERSION = os.getenv("MODEL_VERSION", "sarimax_v1_hourly")
 MODEL_DIR = os.getenv("MODEL_DIR", "/data/models/sarimax")
 
+# >1 forecasts oblasts in a spawned process pool (see train_all_sarimax.py)
+FORECAST_WORKERS = max(1, int(os.getenv("FORECAST_WORKERS", "1")))
+FORECAST_BLAS_THREADS = int(os.getenv("FORECAST_BLAS_THREADS", "0"))
+
+_bins: BinsMatrix | None = None
+
 
 def upsert_forecast(oblast_uid: int, model_version: str, df) -> int:
     rows = [
@@ -44,47 +51,69 @@ def upsert_forecast(oblast_uid: int, model_version: str, df) -> int:
     return len(rows)
 
 
-def main() -> None:
-    cfg = SarimaxConfig()
+def _load_bins() -> None:
+    global _bins
+    _bins = load_bins_matrix([o.uid for o in OBLASTS_ORDERED])
 
-    total_rows = 0
-    ok = 0
-    skipped = 0
 
-    for o in OBLASTS_ORDERED:
-        uid = o.uid
-        model_path = os.path.join(MODEL_DIR, model_filename(uid, MODEL_VERSION, cfg))
+def forecast_one(uid: int) -> tuple[str, int]:
+    """Forecasts and stores one oblast; returns (ok | skipped | error, rows saved)."""
+    cfg = SarimaxConfig()
+    bins = _bins
+    model_path = os.path.join(MODEL_DIR, model_filename(uid, MODEL_VERSION, cfg, extra=exog_extra(uid)))
 
-        if not os.path.exists(model_path):
-            print(f"[forecast-all] uid={uid} skip: model not found")
-            skipped += 1
-            continue
+    if not model_exists(model_path):
+        print(f"[forecast-all] uid={uid} skip: model not found")
+        return "skipped", 0
 
-        try:
-            res = load_model(model_path)
+    try:
+        res, exog_future = conditioned_forecast_inputs(uid, model_path, HORIZON_HOURS, bins=bins)
 
-            last = latest_ts(uid)
+        df = forecast_probs(res, exog_future)
 
-            start = last + pd.Timedelta(hours=1)
-            future_idx = pd.date_range(start, periods=HORIZON_HOURS, freq="h", tz="UTC")
+        df = df.head(HORIZON_HOURS)
 
-            exog_future = build_exog_for_uid(uid, future_idx)
+        saved = upsert_forecast(uid, MODEL_VERSION, df)
 
-            df = forecast_probs(res, exog_future)
+        print(
+            f"[forecast-all] uid={uid} saved={saved} "
+            f"from={df.ts.iloc[0].isoformat()} to={df.ts.iloc[-1].isoformat()}"
+        )
+        return "ok", saved
+    except Exception as e:
+        print(f"[forecast-all] uid={uid} error: {e}")
+        return "error", 0
 
-            df = df.head(HORIZON_HOURS)
 
-            saved = upsert_forecast(uid, MODEL_VERSION, df)
+def main() -> None:
+    _load_bins()
 
-            print(
-                f"[forecast-all] uid={uid} saved={saved} "
-                f"from={df.ts.iloc[0].isoformat()} to={df.ts.iloc[-1].isoformat()}"
-            )
+    uids = [o.uid for o in OBLASTS_ORDERED]
+    if FORECAST_WORKERS > 1:
+        threads = blas_threads_per_worker(FORECAST_WORKERS, FORECAST_BLAS_THREADS)
+        print(f"[forecast-all] workers={FORECAST_WORKERS} blas_threads={threads}")
 
-            total_rows += saved
+    total_rows = 0
+    ok = 0
+    skipped = 0
+
+    results = map_isolated(
+        forecast_one,
+        uids,
+        FORECAST_WORKERS,
+        threads=FORECAST_BLAS_THREADS,
+        initializer=_load_bins if FORECAST_WORKERS > 1 else None,
+    )
+    for uid, result, err in results:
+        if err is not None:
+            print(f"[forecast-all] uid={uid} error: worker failed: {err}")
+            continue
+        status, saved = result
+        if status == "ok":
             ok += 1
-        except Exception as e:
-            print(f"[forecast-all] uid={uid} error: {e}")
+        elif status == "skipped":
+            skipped += 1
+        total_rows += saved
 
     print(f"[forecast-all] done ok={ok} skipped={skipped} rows={total_rows}")
 
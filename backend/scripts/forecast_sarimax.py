@@ -1,15 +1,14 @@
 from __future__ import annotations
 
 import os
-from datetime import timedelta
 
 import pandas as pd
 import psycopg
 
 from app.db import dsn
-from app.data_access.bins import load_bins_series, latest_ts
-from app.data_access.exog import build_exog_for_uid
-from app.ml.model_store import load_model, model_filename
+from app.data_access.exog import exog_extra
+from app.ml.forecast_state import conditioned_forecast_inputs
+from app.ml.model_store import model_exists, model_filename
 from app.ml.sarimax_core import SarimaxConfig, forecast_probs
 
 
@@ -40,29 +39,12 @@ def upsert_forecast(uid: int, model_version: str, df: pd.DataFrame) -> None:
 
 def main() -> None:
     cfg = SarimaxConfig()
-    path = os.path.join(MODEL_DIR, model_filename(UID, MODEL_VERSION, cfg))
+    path = os.path.join(MODEL_DIR, model_filename(UID, MODEL_VERSION, cfg, extra=exog_extra(UID)))
 
-    if not os.path.exists(path):
+    if not model_exists(path):
         raise RuntimeError(f"Model not found: {path}. Train first (train_sarimax.py).")
 
-    res = load_model(path)
-
-    last = latest_ts(UID)
-    future_idx = pd.date_range(
-        last + timedelta(hours=1),
-        periods=HORIZON_HOURS,
-        freq="h",
-        tz="UTC",
-    )
-
-    y_hist = load_bins_series(UID)
-    context_start = y_hist.index.min()
-    context_end = future_idx.max()
-
-    context_idx = pd.date_range(context_start, context_end, freq="h", tz="UTC")
-
-    exog_ctx = build_exog_for_uid(UID, context_idx)
-    exog_future = exog_ctx.loc[future_idx]
+    res, exog_future = conditioned_forecast_inputs(UID, path, HORIZON_HOURS)
 
     df = forecast_probs(res, exog_future)
 
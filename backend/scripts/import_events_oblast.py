@@ -1,58 +1,351 @@
 from __future__ import annotations
 
 import csv
+import io
+import os
 import sys
-from datetime import datetime
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from typing import Iterable, Iterator
+import numpy as np
 import psycopg
 
 from app.db import dsn
-from app.ua_oblasts import OBLASTS_ORDERED
+from app.data_access.events import (
+    EVENTS_CACHE_PATH,
+    NAME_TO_UID,
+    NO_FINISH,
+    EventColumns,
+    columnar_is_fresh,
+    ends_with_newline,
+    events_since,
+    file_fingerprint,
+)
 
-NAME_TO_UID = {o.name: o.uid for o in OBLASTS_ORDERED}
+IMPORT_MODE = os.getenv("IMPORT_MODE", "copy")
+IMPORT_SOURCE = os.getenv("IMPORT_SOURCE", "auto")
+IMPORT_INCREMENTAL = os.getenv("IMPORT_INCREMENTAL", "1") in ("1", "true", "True")
+
+Event = tuple[int, datetime, datetime | None, str | None]
+
+@dataclass
+class ImportResult:
+    inserted: int = 0
+    skipped: int = 0
+    # rows dropped by the watermark: imported by an earlier run
+    already_loaded: int = 0
+
+@dataclass
+class LedgerState:
+    fingerprint: str
+    size_bytes: int
+    mtime_ns: int
+    watermarks: dict[int, datetime]
 
 def parse_dt(s: str) -> datetime:
     return datetime.fromisoformat(s)
 
-def main(csv_path: str) -> None:
-    inserted = 0
-    skipped = 0
+def _as_utc(dt: datetime) -> datetime:
+    return dt.replace(tzinfo=timezone.utc) if dt.tzinfo is None else dt
+
+def parse_row(row: dict[str, str]) -> Event | None:
+    oblast_name = row.get("oblast")
+    raion_name = row.get("raion")
+
+    if oblast_name == "Лубенський район" and raion_name in NAME_TO_UID:
+        oblast_name = raion_name
+
+    if not oblast_name:
+        return None
+
+    uid = NAME_TO_UID.get(oblast_name)
+    if uid is None:
+        raise RuntimeError(f"Unknown oblast name: {oblast_name!r}")
+
+    started_at = parse_dt(row["started_at"])
+    finished_at = parse_dt(row["finished_at"]) if row.get("finished_at") else None
+    source = row.get("source")
+    return uid, started_at, finished_at, source
+
+def iter_events(csv_path: str, offset: int = 0) -> Iterator[Event | None]:
+    """Parsed events in file order from byte `offset` on; None marks a skipped row."""
+    with open(csv_path, "r", encoding="utf-8", newline="") as f:
+        header = next(csv.reader(f), None)
+    if header is None:
+        return
+
+    with open(csv_path, "rb") as raw:
+        if offset > 0:
+            raw.seek(offset)
+        f = io.TextIOWrapper(raw, encoding="utf-8", newline="")
+        reader = csv.DictReader(f, fieldnames=header)
+        if offset == 0:
+            next(reader, None)
+        for row in reader:
+            yield parse_row(row)
+
+def load_ledger(cur: psycopg.Cursor, dataset_path: str) -> LedgerState | None:
+    cur.execute(
+        """
+        SELECT oblast_uid, fingerprint, size_bytes, mtime_ns, last_started_at
+        FROM dataset_import_ledger
+        WHERE dataset_path=%s
+        """,
+        (dataset_path,),
+    )
+    rows = cur.fetchall()
+    if not rows:
+        return None
+
+    _, fingerprint, size_bytes, mtime_ns, _ = rows[0]
+    watermarks = {int(uid): ts for uid, _, _, _, ts in rows if ts is not None}
+    return LedgerState(fingerprint, int(size_bytes), int(mtime_ns), watermarks)
+
+def save_ledger(
+    cur: psycopg.Cursor,
+    dataset_path: str,
+    fingerprint: str,
+    st: os.stat_result,
+    last_started: dict[int, datetime],
+) -> None:
+    cur.execute(
+        """
+        UPDATE dataset_import_ledger
+        SET fingerprint=%s, size_bytes=%s, mtime_ns=%s, imported_at=now()
+        WHERE dataset_path=%s
+        """,
+        (fingerprint, st.st_size, st.st_mtime_ns, dataset_path),
+    )
+
+    for uid in sorted(last_started):
+        cur.execute(
+            """
+            INSERT INTO dataset_import_ledger
+              (dataset_path, oblast_uid, fingerprint, size_bytes, mtime_ns, last_started_at)
+            VALUES (%s, %s, %s, %s, %s, %s)
+            ON CONFLICT (dataset_path, oblast_uid) DO UPDATE
+            SET last_started_at = GREATEST(dataset_import_ledger.last_started_at, EXCLUDED.last_started_at)
+            """,
+            (
+                dataset_path,
+                uid,
+                fingerprint,
+                st.st_size,
+                st.st_mtime_ns,
+                last_started[uid],
+            ),
+        )
+
+def past_watermark(
+    events: Iterable[Event | None],
+    watermarks: dict[int, datetime],
+    last_started: dict[int, datetime],
+    stats: ImportResult,
+) -> Iterator[Event | None]:
+    """Drops events before their oblast's watermark and records the latest started_at per oblast."""
+    for ev in events:
+        if ev is None:
+            yield ev
+            continue
+
+        uid, started_at = ev[0], _as_utc(ev[1])
+
+        wm = watermarks.get(uid)
+        if wm is not None and started_at < wm:
+            stats.already_loaded += 1
+            continue
+
+        prev = last_started.get(uid)
+        if prev is None or started_at > prev:
+            last_started[uid] = started_at
+
+        yield ev
+
+def import_rows(cur: psycopg.Cursor, events: Iterable[Event | None]) -> ImportResult:
+    res = ImportResult()
+
+    for ev in events:
+        if ev is None:
+            res.skipped += 1
+            continue
+
+        cur.execute(
+            """
+            INSERT INTO alarm_events_oblast (oblast_uid, started_at, finished_at, source)
+            VALUES (%s, %s, %s, %s)
+            ON CONFLICT (oblast_uid, started_at, finished_at) DO NOTHING
+            """,
+            ev,
+        )
+        res.inserted += cur.rowcount
+
+    return res
+
+def _create_stage(cur: psycopg.Cursor, time_type: str) -> None:
+    cur.execute(
+        f"""
+        CREATE TEMP TABLE alarm_events_oblast_stage (
+          seq BIGINT NOT NULL,
+          oblast_uid INT NOT NULL,
+          started_at {time_type} NOT NULL,
+          finished_at {time_type},
+          source TEXT
+        ) ON COMMIT DROP
+        """
+    )
+
+def _merge_stage(cur: psycopg.Cursor, res: ImportResult, to_ts: str = "") -> None:
+    cur.execute(
+        f"""
+        INSERT INTO alarm_events_oblast (oblast_uid, started_at, finished_at, source)
+        SELECT oblast_uid, {to_ts}(started_at), {to_ts}(finished_at), source
+        FROM alarm_events_oblast_stage
+        ORDER BY seq
+        ON CONFLICT (oblast_uid, started_at, finished_at) DO NOTHING
+        """
+    )
+    res.inserted += cur.rowcount
+
+_STAGE_COPY = "COPY alarm_events_oblast_stage (seq, oblast_uid, started_at, finished_at, source) FROM STDIN"
+
+def import_copy(cur: psycopg.Cursor, events: Iterable[Event | None]) -> ImportResult:
+    """COPY into a staging table, merged in one statement; the first of duplicate rows wins."""
+    res = ImportResult()
+    _create_stage(cur, "TIMESTAMPTZ")
+
+    with cur.copy(_STAGE_COPY) as copy:
+        for seq, ev in enumerate(events):
+            if ev is None:
+                res.skipped += 1
+                continue
+            copy.write_row((seq, *ev))
+
+    _merge_stage(cur, res)
+    return res
+
+def import_copy_columnar(
+    cur: psycopg.Cursor,
+    cols: EventColumns,
+    watermarks: dict[int, datetime],
+    last_started: dict[int, datetime],
+) -> ImportResult:
+    """import_copy fed from the columnar cache, without per-row parsing in Python."""
+    res = ImportResult(skipped=cols.skipped)
+
+    keep = np.ones(len(cols), dtype=bool)
+    if watermarks and len(cols):
+        wm = np.full(max(int(cols.uid.max()), max(watermarks)) + 1, np.iinfo(np.int64).min, dtype=np.int64)
+        for uid, ts in watermarks.items():
+            wm[uid] = int(_as_utc(ts).timestamp())
+        keep = cols.started_at >= wm[cols.uid]
+        res.already_loaded = int(np.count_nonzero(~keep))
+
+    seq = np.flatnonzero(keep)
+    uid = cols.uid[keep]
+    started_at = cols.started_at[keep]
+    finished_at = cols.finished_at[keep]
+
+    for u in np.unique(uid):
+        ts = datetime.fromtimestamp(int(started_at[uid == u].max()), tz=timezone.utc)
+        last_started[int(u)] = max(ts, last_started.get(int(u), ts))
+
+    _create_stage(cur, "BIGINT")
+
+    with cur.copy(_STAGE_COPY) as copy:
+        for row in zip(
+            seq.tolist(),
+            uid.tolist(),
+            started_at.tolist(),
+            finished_at.tolist(),
+            cols.source[keep].tolist(),
+        ):
+            if row[3] == NO_FINISH:
+                row = (row[0], row[1], row[2], None, row[4])
+            copy.write_row(row)
+
+    _merge_stage(cur, res, "to_timestamp")
+    return res
+
+def use_columnar(csv_path: str, source: str) -> bool:
+    if source == "csv":
+        return False
+    fresh = columnar_is_fresh(EVENTS_CACHE_PATH, csv_path)
+    if source == "columnar" and not fresh:
+        raise RuntimeError(f"Columnar cache is missing or stale: {EVENTS_CACHE_PATH}")
+    return fresh
+
+def main(
+    csv_path: str,
+    mode: str = IMPORT_MODE,
+    incremental: bool = IMPORT_INCREMENTAL,
+    source: str = IMPORT_SOURCE,
+) -> None:
+    if mode not in ("copy", "rows"):
+        raise RuntimeError(f"Unknown IMPORT_MODE: {mode!r} (expected 'copy' or 'rows')")
+    if source not in ("auto", "csv", "columnar"):
+        raise RuntimeError(f"Unknown IMPORT_SOURCE: {source!r} (expected 'auto', 'csv' or 'columnar')")
+
+    dataset_path = os.path.abspath(csv_path)
+    st = os.stat(dataset_path)
 
     with psycopg.connect(dsn()) as conn:
         with conn.cursor() as cur:
-            with open(csv_path, "r", encoding="utf-8", newline="") as f:
-                reader = csv.DictReader(f)
-                for row in reader:
-                    oblast_name = row.get("oblast")
-                    raion_name = row.get("raion")
-
-                    if oblast_name == "Лубенський район" and raion_name in NAME_TO_UID:
-                        oblast_name = raion_name
-
-                    if not oblast_name:
-                        skipped += 1
-                        continue
-
-                    uid = NAME_TO_UID.get(oblast_name)
-                    if uid is None:
-                        raise RuntimeError(f"Unknown oblast name: {oblast_name!r}")
-
-                    started_at = parse_dt(row["started_at"])
-                    finished_at = parse_dt(row["finished_at"]) if row.get("finished_at") else None
-                    source = row.get("source")
-
-                    cur.execute(
-                        """
-                        INSERT INTO alarm_events_oblast (oblast_uid, started_at, finished_at, source)
-                        VALUES (%s, %s, %s, %s)
-                        ON CONFLICT (oblast_uid, started_at, finished_at) DO NOTHING
-                        """,
-                        (uid, started_at, finished_at, source),
-                    )
-                    inserted += cur.rowcount
+            prev = load_ledger(cur, dataset_path) if incremental else None
+
+            if prev and prev.size_bytes == st.st_size and prev.mtime_ns == st.st_mtime_ns:
+                print(f"[import] unchanged (size/mtime): {dataset_path}")
+                return
+
+            fingerprint, prefix_fp = file_fingerprint(dataset_path, prev.size_bytes if prev else None)
+
+            if prev and fingerprint == prev.fingerprint:
+                cur.execute(
+                    "UPDATE dataset_import_ledger SET mtime_ns=%s WHERE dataset_path=%s",
+                    (st.st_mtime_ns, dataset_path),
+                )
+                conn.commit()
+                print(f"[import] unchanged (fingerprint): {dataset_path}")
+                return
+
+            offset = 0
+            watermarks: dict[int, datetime] = {}
+            if (
+                prev
+                and prefix_fp == prev.fingerprint
+                and ends_with_newline(dataset_path, prev.size_bytes)
+            ):
+                offset = prev.size_bytes
+                watermarks = prev.watermarks
+                print(f"[import] appended: reading from byte {offset} of {st.st_size}")
+            elif prev:
+                print("[import] dataset changed: full import")
+
+            last_started: dict[int, datetime] = {}
+
+            cols = None
+            if mode == "copy" and use_columnar(dataset_path, source):
+                cols = events_since(EVENTS_CACHE_PATH, offset)
+                if cols is None:
+                    if source == "columnar":
+                        raise RuntimeError(f"Columnar cache has no rows starting at byte {offset}: {EVENTS_CACHE_PATH}")
+                    print(f"[import] columnar cache has no rows starting at byte {offset}; reading CSV")
+
+            if cols is not None:
+                print(f"[import] reading columnar cache: {EVENTS_CACHE_PATH} rows={len(cols)}")
+                res = import_copy_columnar(cur, cols, watermarks, last_started)
+            else:
+                stats = ImportResult()
+                events = past_watermark(iter_events(dataset_path, offset), watermarks, last_started, stats)
+                if mode == "copy":
+                    res = import_copy(cur, events)
+                else:
+                    res = import_rows(cur, events)
+                res.already_loaded = stats.already_loaded
 
+            save_ledger(cur, dataset_path, fingerprint, st, last_started)
             conn.commit()
 
-    print(f"Inserted: {inserted}, skipped: {skipped}")
+    print(f"Inserted: {res.inserted}, skipped: {res.skipped}, already loaded: {res.already_loaded}")
 
 if __name__ == "__main__":
     if len(sys.argv) != 2:
@@ -15,6 +15,7 @@ def run(cmd: list[str]) -> None:
 def main() -> None:
     run([sys.executable, "scripts/init_db.py"])
     run([sys.executable, "scripts/ensure_dataset.py"])
+    run([sys.executable, "scripts/build_events_cache.py", DATASET_PATH])
     run([sys.executable, "scripts/import_events_oblast.py", DATASET_PATH])
     run([sys.executable, "scripts/build_hourly_bins.py"])
     print("[load] done")
@@ -6,7 +6,7 @@ import numpy as np
 import pandas as pd
 
 from app.data_access.bins import load_bins_series
-from app.data_access.exog import build_exog_for_uid
+from app.data_access.exog import build_exog_for_uid, exog_extra
 from app.ml.metrics import (
     roc_auc,
     average_precision,
@@ -70,8 +70,9 @@ def _print_cls(prefix: str, y_true: np.ndarray, p: np.ndarray, thresholds: tuple
 def main() -> None:
     cfg = SarimaxConfig()
 
-    extra = {"lookback_days": LOOKBACK_DAYS} if LOOKBACK_DAYS > 0 else None
-    model_path = os.path.join(MODEL_DIR, model_filename(UID, MODEL_VERSION, cfg, extra=extra))
+    extra = {"lookback_days": LOOKBACK_DAYS} if LOOKBACK_DAYS > 0 else {}
+    extra.update(exog_extra(UID) or {})
+    model_path = os.path.join(MODEL_DIR, model_filename(UID, MODEL_VERSION, cfg, extra=extra or None))
 
     try:
         res = load_model(model_path)
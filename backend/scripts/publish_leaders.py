@@ -0,0 +1,80 @@
+from __future__ import annotations
+
+import os
+
+import psycopg
+
+from app.db import dsn
+from app.data_access.bins import load_bins_matrix
+from app.data_access.exog import exog_extra
+from app.data_access.exog_store import EXOG_STORE, update_exog_store
+from app.ml.model_store import delete_model, model_exists, model_filename
+from app.ml.sarimax_core import SarimaxConfig
+from app.ua_oblasts import OBLASTS_ORDERED
+from app import ua_neighbors
+
+MODEL_VERSION = os.getenv("MODEL_VERSION", "sarimax_v1_hourly")
+MODEL_DIR = os.getenv("MODEL_DIR", "/data/models/sarimax")
+
+
+def _model_paths(cfg: SarimaxConfig, uids: list[int], pending: bool) -> dict[int, str]:
+    ua_neighbors.reload_neighbors(pending=pending)
+    return {uid: os.path.join(MODEL_DIR, model_filename(uid, MODEL_VERSION, cfg, extra=exog_extra(uid))) for uid in uids}
+
+
+def main() -> int:
+    with psycopg.connect(dsn()) as conn:
+        with conn.cursor() as cur:
+            cur.execute("SELECT DISTINCT oblast_uid FROM oblast_leaders_pending ORDER BY oblast_uid")
+            uids = [int(r[0]) for r in cur.fetchall()]
+    if not uids:
+        print("[publish-leaders] nothing pending")
+        return 0
+
+    # an oblast moves to its new leaders only once a model keyed on them
+    # exists, so forecast_all never looks for a model that was not trained
+    cfg = SarimaxConfig()
+    old = _model_paths(cfg, uids, pending=False)
+    new = _model_paths(cfg, uids, pending=True)
+    ready = [uid for uid in uids if old[uid] == new[uid] or model_exists(new[uid])]
+    for uid in sorted(set(uids) - set(ready)):
+        print(f"[publish-leaders] uid={uid} kept: no model for the pending leaders")
+
+    if ready:
+        with psycopg.connect(dsn()) as conn:
+            with conn.cursor() as cur:
+                cur.execute("DELETE FROM oblast_leaders WHERE oblast_uid = ANY(%s)", (ready,))
+                cur.execute(
+                    """
+                    INSERT INTO oblast_leaders (oblast_uid, leader_uid, rank, lag_hours, score, computed_at)
+                    SELECT oblast_uid, leader_uid, rank, lag_hours, score, computed_at
+                    FROM oblast_leaders_pending WHERE oblast_uid = ANY(%s)
+                    """,
+                    (ready,),
+                )
+                cur.execute("DELETE FROM oblast_leaders_pending WHERE oblast_uid = ANY(%s)", (ready,))
+            conn.commit()
+    ua_neighbors.reload_neighbors(pending=False)
+
+    # models keyed on the replaced leaders are not looked up any more
+    superseded = [uid for uid in ready if old[uid] != new[uid]]
+    for uid in superseded:
+        delete_model(old[uid])
+        print(f"[publish-leaders] uid={uid} removed superseded model {os.path.basename(old[uid])}")
+    print(f"[publish-leaders] published={len(ready)} kept={len(uids) - len(ready)} superseded={len(superseded)}")
+
+    # neighbour lists may have changed; rebuild the exog store for those oblasts
+    if superseded and EXOG_STORE:
+        bins = load_bins_matrix([o.uid for o in OBLASTS_ORDERED])
+        try:
+            for uid, what in update_exog_store(bins, changed={}, before=bins.stamps).items():
+                if not what.startswith("patched=0 appended=0"):
+                    print(f"[publish-leaders] exog store uid={uid}: {what}")
+        except OSError as e:
+            print(f"[publish-leaders] exog store not updated: {e}")
+
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
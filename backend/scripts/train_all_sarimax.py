@@ -5,11 +5,14 @@ import sys
 import time
 
 from app.ua_oblasts import OBLASTS_ORDERED
-from app.ml.sarimax_core import SarimaxConfig, fit_sarimax
-from app.ml.model_store import ensure_dir, load_model, save_model, model_filename
+from app.ml.fit_telemetry import FitRecorder
+from app.ml.sarimax_core import SarimaxConfig
+from app.ml.model_store import ensure_dir, save_model, model_filename, warm_start_params
+from app.ml.parallel import blas_threads_per_worker, map_isolated
+from app.ml.train_window import TRAIN_WINDOW_DAYS, plan_window, save_window_init
 
-from app.data_access.bins import load_bins_series
-from app.data_access.exog import build_exog_for_uid
+from app.data_access.bins import BinsMatrix, load_bins_matrix
+from app.data_access.exog import build_exog_for_uid, exog_extra
 
 
 MODEL_VERSION = os.getenv("MODEL_VERSION", "sarimax_v1_hourly")
@@ -20,6 +23,11 @@ FALLBACK_MAXITER = int(os.getenv("FALLBACK_MAXITER", "200"))
 
 MIN_BINS = int(os.getenv("MIN_TRAIN_BINS", str(24 * 30)))
 
+TRAIN_WORKERS = max(1, int(os.getenv("TRAIN_WORKERS", "1")))
+TRAIN_BLAS_THREADS = int(os.getenv("TRAIN_BLAS_THREADS", "0"))
+
+_bins: BinsMatrix | None = None
+
 
 def _is_converged(res) -> bool:
     try:
@@ -28,86 +36,125 @@ def _is_converged(res) -> bool:
         return True
 
 
-def main() -> int:
+def _load_bins() -> None:
+    global _bins
+    _bins = load_bins_matrix([o.uid for o in OBLASTS_ORDERED])
+
+
+def train_one(uid: int) -> str:
+    """Fits and saves one oblast's model; returns ok, skipped or error."""
     cfg = SarimaxConfig()
-    ensure_dir(MODEL_DIR)
+    bins = _bins
 
-    ok = 0
-    skipped = 0
-    errors = 0
-
-    for o in OBLASTS_ORDERED:
-        uid = o.uid
-
-        try:
-            y = load_bins_series(uid)
-        except RuntimeError as e:
-            msg = str(e).lower()
-            if "no bins" in msg:
-                print(f"[train-all] uid={uid} skip: no bins")
-                skipped += 1
-                continue
-            print(f"[train-all] uid={uid} error: {e}")
-            errors += 1
-            continue
-        except Exception as e:
-            print(f"[train-all] uid={uid} error: {e}")
-            errors += 1
-            continue
-
-        if len(y) < MIN_BINS:
-            print(f"[train-all] uid={uid} skip: not enough data n={len(y)}")
-            skipped += 1
-            continue
-
-        exog = build_exog_for_uid(uid, y.index)
-
-        path = os.path.join(MODEL_DIR, model_filename(uid, MODEL_VERSION, cfg))
-        start_params = None
-
-        if os.path.exists(path):
-            try:
-                prev = load_model(path)
-                start_params = getattr(prev, "params", None)
-            except Exception as e:
-                print(f"[train-all] uid={uid} warn: failed to load prev model ({e}); training cold")
-
-        t0 = time.time()
-        try:
-            first_maxiter = WARM_MAXITER if start_params is not None else FALLBACK_MAXITER
-
-            res = fit_sarimax(
+    try:
+        y = bins.series(uid)
+    except RuntimeError as e:
+        msg = str(e).lower()
+        if "no bins" in msg:
+            print(f"[train-all] uid={uid} skip: no bins")
+            return "skipped"
+        print(f"[train-all] uid={uid} error: {e}")
+        return "error"
+    except Exception as e:
+        print(f"[train-all] uid={uid} error: {e}")
+        return "error"
+
+    if len(y) < MIN_BINS:
+        print(f"[train-all] uid={uid} skip: not enough data n={len(y)}")
+        return "skipped"
+
+    exog = build_exog_for_uid(uid, y.index, bins=bins)
+
+    path = os.path.join(MODEL_DIR, model_filename(uid, MODEL_VERSION, cfg, extra=exog_extra(uid)))
+    start_params, source = warm_start_params(path)
+    if start_params is None:
+        print(f"[train-all] uid={uid} no previous params; training cold")
+    elif source != "own":
+        print(f"[train-all] uid={uid} warm-start from {source} params")
+
+    window = None
+    if TRAIN_WINDOW_DAYS > 0:
+        window = plan_window(path, y, exog, cfg, TRAIN_WINDOW_DAYS, params=start_params)
+        if window is not None:
+            y, exog = y.loc[window.start:], exog.loc[window.start:]
+            print(f"[train-all] uid={uid} window days={window.days} start={window.start} init={window.init_source}")
+    initialization = window.initialization if window is not None else None
+
+    rec = FitRecorder(uid, MODEL_VERSION, "train_all")
+    t0 = time.time()
+    try:
+        first_maxiter = WARM_MAXITER if start_params is not None else FALLBACK_MAXITER
+
+        res = rec.fit(
+            y=y,
+            exog=exog,
+            cfg=cfg,
+            start_params=start_params,
+            maxiter_override=first_maxiter,
+            start_source=source,
+            initialization=initialization,
+        )
+
+        converged = _is_converged(res)
+
+        if start_params is not None and (not converged) and FALLBACK_MAXITER > WARM_MAXITER:
+            res = rec.fit(
                 y=y,
                 exog=exog,
                 cfg=cfg,
                 start_params=start_params,
-                maxiter_override=first_maxiter,
+                maxiter_override=FALLBACK_MAXITER,
+                start_source=source,
+                initialization=initialization,
             )
-
             converged = _is_converged(res)
 
-            if start_params is not None and (not converged) and FALLBACK_MAXITER > WARM_MAXITER:
-                res = fit_sarimax(
-                    y=y,
-                    exog=exog,
-                    cfg=cfg,
-                    start_params=start_params,
-                    maxiter_override=FALLBACK_MAXITER,
-                )
-                converged = _is_converged(res)
+        save_model(
+            res,
+            path,
+            fit_seconds=time.time() - t0,
+            window=window.manifest_entry() if window is not None else None,
+        )
+        if window is not None:
+            save_window_init(path, res, window)
+        rec.flush(path)
+        print(f"[train-all] uid={uid} converged={converged} seconds={time.time()-t0:.1f} saved={path}")
+        return "ok"
 
-            save_model(res, path)
-            print(f"[train-all] uid={uid} converged={converged} seconds={time.time()-t0:.1f} saved={path}")
-            ok += 1
+    except Exception as e:
+        rec.flush()
+        print(f"[train-all] uid={uid} error during fit: {e}")
+        return "error"
 
-        except Exception as e:
-            print(f"[train-all] uid={uid} error during fit: {e}")
-            errors += 1
-            continue
 
-    print(f"[train-all] done ok={ok} skipped={skipped} errors={errors}")
-
-    return 0 if ok > 0 else 2
+def main() -> int:
+    ensure_dir(MODEL_DIR)
+    _load_bins()
+
+    uids = [o.uid for o in OBLASTS_ORDERED]
+    if TRAIN_WORKERS > 1:
+        # longest series first so the slowest fits are not left for last
+        uids.sort(key=lambda u: -(_bins.spans[u][1] - _bins.spans[u][0]) if u in _bins.spans else 0)
+        threads = blas_threads_per_worker(TRAIN_WORKERS, TRAIN_BLAS_THREADS)
+        print(f"[train-all] workers={TRAIN_WORKERS} blas_threads={threads}")
+
+    counts = {"ok": 0, "skipped": 0, "error": 0}
+    results = map_isolated(
+        train_one,
+        uids,
+        TRAIN_WORKERS,
+        threads=TRAIN_BLAS_THREADS,
+        initializer=_load_bins if TRAIN_WORKERS > 1 else None,
+    )
+    for uid, status, err in results:
+        if err is not None:
+            print(f"[train-all] uid={uid} error: worker failed: {err}")
+            status = "error"
+        counts[status] += 1
+
+    print(f"[train-all] done ok={counts['ok']} skipped={counts['skipped']} errors={counts['error']}")
+
+    return 0 if counts["ok"] > 0 else 2
 
 
 if __name__ == "__main__":
@@ -5,9 +5,10 @@ import time
 import pandas as pd
 
 from app.data_access.bins import load_bins_series
-from app.data_access.exog import build_exog_for_uid
-from app.ml.model_store import ensure_dir, load_model, model_filename, save_model
-from app.ml.sarimax_core import SarimaxConfig, fit_sarimax
+from app.data_access.exog import build_exog_for_uid, exog_extra
+from app.ml.model_store import ensure_dir, model_filename, save_model, warm_start_params
+from app.ml.fit_telemetry import FitRecorder
+from app.ml.sarimax_core import SarimaxConfig
 
 
 UID = int(os.getenv("TRAIN_UID", "14"))
@@ -40,29 +41,30 @@ def main() -> None:
     cfg = SarimaxConfig()
     ensure_dir(MODEL_DIR)
 
-    extra = {"lookback_days": LOOKBACK_DAYS} if LOOKBACK_DAYS > 0 else None
-    path = os.path.join(MODEL_DIR, model_filename(UID, MODEL_VERSION, cfg, extra=extra))
+    extra = {"lookback_days": LOOKBACK_DAYS} if LOOKBACK_DAYS > 0 else {}
+    extra.update(exog_extra(UID) or {})
+    path = os.path.join(MODEL_DIR, model_filename(UID, MODEL_VERSION, cfg, extra=extra or None))
 
-    start_params = None
-    if os.path.exists(path) or os.path.exists(path + ".gz"):
-        prev = load_model(path)
-        start_params = getattr(prev, "params", None)
-        print(f"[train] warm-start from existing model: {path} (or .gz)")
+    start_params, source = warm_start_params(path)
+    if start_params is not None:
+        print(f"[train] warm-start from {source} params: {path}")
     else:
-        print("[train] no previous model found for this signature (cold start)")
+        print("[train] no previous params found for this signature (cold start)")
 
     print(
         f"[train] uid={UID} model_version={MODEL_VERSION} lookback_days={LOOKBACK_DAYS} "
         f"n={len(y)} (full_n={len(y_full)})"
     )
 
+    rec = FitRecorder(UID, MODEL_VERSION, "train")
     t0 = time.time()
-    res = fit_sarimax(
+    res = rec.fit(
         y=y,
         exog=exog,
         cfg=cfg,
         start_params=start_params,
         maxiter_override=WARM_MAXITER if start_params is not None else FALLBACK_MAXITER,
+        start_source=source,
     )
 
     converged = getattr(res, "mle_retvals", {}).get("converged", True)
@@ -70,17 +72,19 @@ def main() -> None:
 
     if start_params is not None and not converged and FALLBACK_MAXITER > WARM_MAXITER:
         print(f"[train] warm-start did not converge, retrying with maxiter={FALLBACK_MAXITER}")
-        res = fit_sarimax(
+        res = rec.fit(
             y=y,
             exog=exog,
             cfg=cfg,
             start_params=start_params,
             maxiter_override=FALLBACK_MAXITER,
+            start_source=source,
         )
         converged2 = getattr(res, "mle_retvals", {}).get("converged", True)
         print(f"[train] converged_after_fallback={converged2}")
 
-    save_model(res, path)
+    save_model(res, path, fit_seconds=time.time() - t0)
+    rec.flush(path)
     print(f"[train] saved: {path} (or .gz if enabled)")
     print(f"[train] seconds={time.time() - t0:.1f}")
     print(f"[train] series_max_ts: {y.index.max().isoformat()}")